@@ -0,0 +1,291 @@
+import json
+import os
+import platform
+import resource
+import threading
+import time
+from datetime import datetime
+import multiprocessing
+
+import numpy as np
+
+from infer_tflite import ClassifierSession, preprocess_image, scan_images
+
+# float32 comes from `convert_tflite.py --mode float32`, float16 from the default
+# conversion and int8 from `--mode int8`; missing variants are skipped
+DEFAULT_MODELS = [
+    './models/recyclable_classifier_float32.tflite',
+    './models/recyclable_classifier.tflite',
+    './models/recyclable_classifier_quant.tflite',
+]
+
+def load_inputs(input_shape, image_dir=None, num_images=32, seed=0):
+    height, width = int(input_shape[1]), int(input_shape[2])
+
+    if image_dir:
+        paths = []
+        for path in scan_images(image_dir, recursive=True):
+            paths.append(path)
+            if len(paths) == num_images:
+                break
+        if paths:
+            return np.concatenate([preprocess_image(path, input_shape) for path in paths])
+        print(f"No images found in {image_dir}, using synthetic inputs")
+
+    rng = np.random.default_rng(seed)
+    return rng.uniform(0, 255, (num_images, height, width, 3)).astype(np.float32)
+
+def summarize_latencies(latencies_ms):
+    latencies_ms = np.asarray(latencies_ms)
+    return {
+        'mean_ms': float(np.mean(latencies_ms)),
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p95_ms': float(np.percentile(latencies_ms, 95)),
+        'p99_ms': float(np.percentile(latencies_ms, 99)),
+    }
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if platform.system() == 'Darwin' else peak / 1024
+
+def current_rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return peak_rss_mb()
+
+class ResourceSampler:
+    """Samples process CPU and RSS on a background thread while a benchmark runs."""
+
+    def __init__(self, interval=0.1):
+        self.interval = interval
+        self.trace = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        start = last_wall = time.perf_counter()
+        last_cpu = time.process_time()
+        while not self._stop.wait(self.interval):
+            wall, cpu = time.perf_counter(), time.process_time()
+            self.trace.append({
+                't_sec': round(wall - start, 3),
+                'cpu_percent': round(100 * (cpu - last_cpu) / (wall - last_wall), 1),
+                'rss_mb': round(current_rss_mb(), 1),
+            })
+            last_wall, last_cpu = wall, cpu
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+def benchmark_variant(model_path, labels_path, inputs, batch_sizes=(1, 4, 8),
+                      thread_counts=(1, 2, 4), runs=50, warmup=5):
+    with ResourceSampler() as sampler:
+        result = _benchmark_variant(model_path, labels_path, inputs, batch_sizes,
+                                    thread_counts, runs, warmup)
+    result['resource_trace'] = sampler.trace
+    return result
+
+def _benchmark_variant(model_path, labels_path, inputs, batch_sizes, thread_counts,
+                       runs, warmup):
+    load_start = time.perf_counter()
+    session = ClassifierSession(model_path, labels_path, num_threads=thread_counts[0])
+    load_ms = (time.perf_counter() - load_start) * 1000
+
+    top1 = [int(np.argmax(session.predict(inputs[i]))) for i in range(len(inputs))]
+
+    configs = []
+    for index, num_threads in enumerate(thread_counts):
+        # The session loaded above already uses the first thread count
+        if index:
+            session = ClassifierSession(model_path, labels_path, num_threads=num_threads)
+
+        for batch_size in batch_sizes:
+            if not session.set_batch_size(batch_size):
+                configs.append({'num_threads': num_threads, 'batch_size': batch_size,
+                                'supported': False})
+                continue
+
+            indices = np.arange(batch_size) % len(inputs)
+            batch = np.ascontiguousarray(inputs[indices])
+
+            for _ in range(warmup):
+                session.predict_batch(batch)
+
+            latencies_ms = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                session.predict_batch(batch)
+                latencies_ms.append((time.perf_counter() - start) * 1000)
+
+            result = {'num_threads': num_threads, 'batch_size': batch_size, 'supported': True}
+            result.update(summarize_latencies(latencies_ms))
+            result['images_per_sec'] = batch_size * runs / (sum(latencies_ms) / 1000)
+            # Raw samples so the dashboard can plot the full distribution
+            result['latencies_ms'] = [round(value, 3) for value in latencies_ms]
+            configs.append(result)
+
+            print(f"  threads={num_threads} batch={batch_size}: "
+                  f"p50 {result['p50_ms']:.2f} ms, p95 {result['p95_ms']:.2f} ms, "
+                  f"p99 {result['p99_ms']:.2f} ms, {result['images_per_sec']:.1f} images/sec")
+
+    return {
+        'model': model_path,
+        'model_size_kb': os.path.getsize(model_path) / 1024,
+        'input_dtype': str(np.dtype(session.input_dtype)),
+        'load_ms': load_ms,
+        'peak_rss_mb': peak_rss_mb(),
+        'configs': configs,
+        'top1': top1,
+    }
+
+def keras_top1(keras_model_path, inputs):
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(keras_model_path)
+    predictions = model.predict(inputs, verbose=0)
+    return [int(idx) for idx in np.argmax(predictions, axis=1)]
+
+def run_benchmarks(models=None, labels_path='./models/class_names.txt',
+                   image_dir=None, num_images=32, batch_sizes=(1, 4, 8),
+                   thread_counts=(1, 2, 4), runs=50, warmup=5,
+                   keras_model_path=None, output_path='./models/benchmark_results.json'):
+    candidates = models or DEFAULT_MODELS
+    models = [path for path in candidates if os.path.exists(path)]
+    for path in candidates:
+        if path not in models:
+            print(f"Skipping {path}: not found")
+    if not models:
+        raise FileNotFoundError("No TFLite models found to benchmark")
+
+    input_shape = ClassifierSession(models[0], labels_path).input_shape
+    inputs = load_inputs(input_shape, image_dir=image_dir, num_images=num_images)
+
+    reference = None
+    if keras_model_path and os.path.exists(keras_model_path):
+        print(f"Computing reference predictions with {keras_model_path}...")
+        reference = keras_top1(keras_model_path, inputs)
+
+    # Each variant runs in a fresh process so peak RSS is measured per model
+    context = multiprocessing.get_context('spawn')
+    variants = []
+    for model_path in models:
+        print(f"\nBenchmarking {model_path}...")
+        with context.Pool(1) as pool:
+            result = pool.apply(benchmark_variant,
+                                (model_path, labels_path, inputs, tuple(batch_sizes),
+                                 tuple(thread_counts), runs, warmup))
+
+        if reference is not None:
+            agreement = np.mean(np.array(result['top1']) == np.array(reference))
+            result['top1_agreement'] = float(agreement)
+            print(f"  top-1 agreement with Keras: {agreement * 100:.1f}%")
+        result.pop('top1')
+
+        print(f"  size {result['model_size_kb']:.1f} KB, peak RSS {result['peak_rss_mb']:.1f} MB")
+        variants.append(result)
+
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'machine': {
+            'hostname': platform.node(),
+            'platform': platform.platform(),
+            'processor': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'python': platform.python_version(),
+        },
+        'inputs': 'images' if image_dir else 'synthetic',
+        'num_images': int(len(inputs)),
+        'runs': runs,
+        'variants': variants,
+    }
+
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nBenchmark results saved to {output_path}")
+
+    return report
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Benchmark float32 / float16 / int8 TFLite model variants'
+    )
+    parser.add_argument(
+        '--models',
+        nargs='+',
+        default=None,
+        help='TFLite models to compare (defaults to the float32, float16 and int8 exports)'
+    )
+    parser.add_argument(
+        '--labels',
+        default='./models/class_names.txt',
+        help='Path to class labels file'
+    )
+    parser.add_argument(
+        '--keras-model',
+        default='./models/recyclable_classifier.h5',
+        help='Keras model used as the top-1 agreement reference'
+    )
+    parser.add_argument(
+        '--images',
+        default=None,
+        help='Directory of sample images (synthetic inputs when omitted)'
+    )
+    parser.add_argument(
+        '--num-images',
+        type=int,
+        default=32,
+        help='Number of inputs used for agreement and batches'
+    )
+    parser.add_argument(
+        '--batch-sizes',
+        type=int,
+        nargs='+',
+        default=[1, 4, 8],
+        help='Batch sizes to measure'
+    )
+    parser.add_argument(
+        '--threads',
+        type=int,
+        nargs='+',
+        default=[1, 2, 4],
+        help='Interpreter num_threads values to measure'
+    )
+    parser.add_argument(
+        '--runs',
+        type=int,
+        default=50,
+        help='Timed invokes per configuration'
+    )
+    parser.add_argument(
+        '--output',
+        default='./models/benchmark_results.json',
+        help='Where to write the JSON report'
+    )
+
+    args = parser.parse_args()
+
+    run_benchmarks(models=args.models,
+                   labels_path=args.labels,
+                   image_dir=args.images,
+                   num_images=args.num_images,
+                   batch_sizes=args.batch_sizes,
+                   thread_counts=args.threads,
+                   runs=args.runs,
+                   keras_model_path=args.keras_model,
+                   output_path=args.output)
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,14 @@
 import tensorflow as tf
+import numpy as np
 import os
+from train import load_dataset
 
 def convert_to_tflite(model_path='./models/recyclable_classifier.h5',
                       output_path='./models/recyclable_classifier.tflite',
-                      quantize=True):
-    print(f"Loading model from {model_path}...")
-    model = tf.keras.models.load_model(model_path)
+                      quantize=True, model=None):
+    if model is None:
+        print(f"Loading model from {model_path}...")
+        model = tf.keras.models.load_model(model_path)
 
     converter = tf.lite.TFLiteConverter.from_keras_model(model)
 
@@ -30,17 +33,49 @@ def convert_to_tflite(model_path='./models/recyclable_classifier.h5',
     print(f"Size reduction: {((original_size - tflite_size) / original_size * 100):.2f}%")
     print(f"Model saved to {output_path}")
 
+def make_representative_dataset(data_dir='./data', num_samples=200,
+                                img_height=224, img_width=224):
+    def representative_dataset():
+        train_ds, _, class_names = load_dataset(data_dir, img_height, img_width,
+                                                batch_size=32, cache=False)
+        per_class = max(1, num_samples // len(class_names))
+        counts = np.zeros(len(class_names), dtype=np.int64)
+
+        # The training split is shuffled, so taking the first N images of each
+        # class gives a stratified sample without reading the whole dataset
+        for images, labels in train_ds:
+            for image, label in zip(images.numpy(), labels.numpy()):
+                if counts[label] >= per_class:
+                    continue
+                counts[label] += 1
+                yield [np.expand_dims(image.astype(np.float32), axis=0)]
+
+            if counts.min() >= per_class:
+                break
+
+        print(f"Calibrated with {int(counts.sum())} images: "
+              + ", ".join(f"{name}={count}" for name, count in zip(class_names, counts)))
+
+    return representative_dataset
+
 def convert_with_full_quantization(model_path='./models/recyclable_classifier.h5',
                                    output_path='./models/recyclable_classifier_quant.tflite',
-                                   representative_dataset=None):
-    print(f"Loading model from {model_path}...")
-    model = tf.keras.models.load_model(model_path)
+                                   representative_dataset=None, model=None,
+                                   quantization_aware=False, sparse=False):
+    if model is None:
+        print(f"Loading model from {model_path}...")
+        model = tf.keras.models.load_model(model_path)
 
     converter = tf.lite.TFLiteConverter.from_keras_model(model)
     converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if sparse:
+        converter.optimizations.append(tf.lite.Optimize.EXPERIMENTAL_SPARSITY)
 
-    if representative_dataset:
-        converter.representative_dataset = representative_dataset
+    if representative_dataset or quantization_aware:
+        # QAT models carry int8 ranges for the layers they annotate; any
+        # representative dataset passed alongside covers the remaining tensors
+        if representative_dataset:
+            converter.representative_dataset = representative_dataset
         converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
         converter.inference_input_type = tf.uint8
         converter.inference_output_type = tf.uint8
@@ -53,7 +88,66 @@ def convert_with_full_quantization(model_path='./models/recyclable_classifier.h5
         f.write(tflite_model)
 
     print(f"Fully quantized model saved to {output_path}")
+    print(f"TFLite model size: {os.path.getsize(output_path) / 1024:.2f} KB")
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Convert the trained Keras model to TensorFlow Lite'
+    )
+    parser.add_argument(
+        '--mode',
+        choices=['float16', 'float32', 'int8'],
+        default='float16',
+        help='float16/float32 weights, or full integer quantization with uint8 input/output'
+    )
+    parser.add_argument(
+        '--model',
+        default='./models/recyclable_classifier.h5',
+        help='Path to the trained Keras model'
+    )
+    parser.add_argument(
+        '--output',
+        default=None,
+        help='Where to write the TFLite model'
+    )
+    parser.add_argument(
+        '--data-dir',
+        default='./data',
+        help='Dataset used to calibrate int8 quantization'
+    )
+    parser.add_argument(
+        '--num-samples',
+        type=int,
+        default=200,
+        help='Calibration images for int8 quantization, split evenly across classes'
+    )
+
+    args = parser.parse_args()
+
+    if args.mode == 'int8':
+        model = tf.keras.models.load_model(args.model)
+        img_height, img_width = model.input_shape[1], model.input_shape[2]
+        del model
+
+        convert_with_full_quantization(
+            model_path=args.model,
+            output_path=args.output or './models/recyclable_classifier_quant.tflite',
+            representative_dataset=make_representative_dataset(
+                args.data_dir, args.num_samples, img_height, img_width
+            )
+        )
+    elif args.mode == 'float32':
+        convert_to_tflite(model_path=args.model,
+                          output_path=args.output or './models/recyclable_classifier_float32.tflite',
+                          quantize=False)
+    else:
+        convert_to_tflite(model_path=args.model,
+                          output_path=args.output or './models/recyclable_classifier.tflite',
+                          quantize=True)
 
-if __name__ == "__main__":
-    convert_to_tflite(quantize=True)
     print("\nConversion completed successfully!")
+
+if __name__ == "__main__":
+    main()
@@ -1,70 +1,427 @@
+import time
+
+_MODULE_START = time.perf_counter()
+
+import os
+import sys
+import csv
+import json
+import queue
+import importlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import numpy as np
 from PIL import Image
-import os
 
-try:
-    import tflite_runtime.interpreter as tflite
-    print("Using tflite_runtime (optimized for edge devices)")
-except ImportError:
-    import tensorflow.lite as tflite
-    print("Using tensorflow.lite")
+MODULE_IMPORT_SECONDS = time.perf_counter() - _MODULE_START
+
+# Standalone interpreters, tried in order before falling back to full TensorFlow
+RUNTIMES = (
+    ('tflite_runtime', 'tflite_runtime.interpreter'),
+    ('ai_edge_litert', 'ai_edge_litert.interpreter'),
+)
+
+_runtime = None
+
+def load_runtime():
+    """Imports the TFLite interpreter on first use and returns (name, module, import seconds).
+
+    Nothing is imported when this module loads, so modes that never build an
+    interpreter start instantly. Importing tensorflow takes seconds on a Pi and
+    only happens when neither standalone runtime is installed.
+    """
+    global _runtime
+    if _runtime is None:
+        start = time.perf_counter()
+        for name, module_name in RUNTIMES:
+            try:
+                module = importlib.import_module(module_name)
+                break
+            except ImportError:
+                continue
+        else:
+            try:
+                import tensorflow as tf
+            except ImportError:
+                raise ImportError("No TFLite interpreter found. Install tflite-runtime "
+                                  "(pip install tflite-runtime) or tensorflow") from None
+            print("tflite_runtime not installed, falling back to tensorflow.lite "
+                  "(slow start-up)", file=sys.stderr)
+            name, module = 'tensorflow', tf.lite
+        _runtime = (name, module, time.perf_counter() - start)
+    return _runtime
+
+def startup_report(session):
+    name, _, runtime_seconds = load_runtime()
+    return (f"Start-up: modules {MODULE_IMPORT_SECONDS * 1000:.0f} ms, "
+            f"{name} import {runtime_seconds * 1000:.0f} ms, "
+            f"model load {session.load_seconds * 1000:.0f} ms")
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
 
 def load_labels(label_path='./models/class_names.txt'):
     with open(label_path, 'r') as f:
         return [line.strip() for line in f.readlines()]
 
-def preprocess_image(image_path, input_shape):
-    img = Image.open(image_path).convert('RGB')
-    img = img.resize((input_shape[1], input_shape[2]))
-    img_array = np.array(img, dtype=np.float32)
-    img_array = np.expand_dims(img_array, axis=0)
-    return img_array
-
-def run_inference(model_path='./models/recyclable_classifier.tflite',
-                 image_path='./sample.jpg',
-                 labels_path='./models/class_names.txt'):
-    print(f"Loading TFLite model from {model_path}...")
-    interpreter = tflite.Interpreter(model_path=model_path)
-    interpreter.allocate_tensors()
-
-    input_details = interpreter.get_input_details()
-    output_details = interpreter.get_output_details()
+def preprocess_into(frame, out):
+    height, width = out.shape[0], out.shape[1]
 
-    print(f"Input shape: {input_details[0]['shape']}")
-    print(f"Input type: {input_details[0]['dtype']}")
+    if isinstance(frame, np.ndarray):
+        if frame.shape[0] == height and frame.shape[1] == width:
+            np.copyto(out, frame, casting='unsafe')
+            return out
+        frame = Image.fromarray(np.ascontiguousarray(frame))
 
-    print(f"Loading and preprocessing image from {image_path}...")
-    input_data = preprocess_image(image_path, input_details[0]['shape'])
+    img = frame.convert('RGB').resize((width, height))
+    np.copyto(out, np.asarray(img), casting='unsafe')
+    return out
 
-    if input_details[0]['dtype'] == np.uint8:
-        input_scale, input_zero_point = input_details[0]['quantization']
-        input_data = input_data / input_scale + input_zero_point
-        input_data = input_data.astype(np.uint8)
-
-    interpreter.set_tensor(input_details[0]['index'], input_data)
+def preprocess_array(frame, input_shape):
+    img_array = np.empty((1, int(input_shape[1]), int(input_shape[2]), 3), dtype=np.float32)
+    preprocess_into(frame, img_array[0])
+    return img_array
 
-    print("Running inference...")
-    interpreter.invoke()
+def preprocess_image(image_path, input_shape):
+    return preprocess_array(Image.open(image_path), input_shape)
+
+def _preprocess_path(image_path, input_shape):
+    # Failures are returned rather than raised so one unreadable file cannot
+    # abort a long scan; UnidentifiedImageError is a subclass of OSError
+    try:
+        return image_path, preprocess_image(image_path, input_shape)[0], None
+    except (OSError, Image.DecompressionBombError) as e:
+        return image_path, None, f"{type(e).__name__}: {e}"
+
+def iter_preprocessed(image_paths, input_shape, workers=1, ordered=True,
+                      use_processes=False, max_pending=None):
+    input_shape = tuple(int(dim) for dim in input_shape)
+
+    if workers <= 1:
+        for image_path in image_paths:
+            yield _preprocess_path(image_path, input_shape)
+        return
+
+    if use_processes:
+        # Deferred: concurrent.futures imports multiprocessing on first access
+        from concurrent.futures import ProcessPoolExecutor
+        executor_class = ProcessPoolExecutor
+    else:
+        executor_class = ThreadPoolExecutor
+    max_pending = max_pending or workers * 4
+    image_paths = iter(image_paths)
+
+    with executor_class(max_workers=workers) as executor:
+        def submit_next():
+            for image_path in image_paths:
+                return executor.submit(_preprocess_path, image_path, input_shape)
+            return None
+
+        if ordered:
+            pending = deque()
+            while len(pending) < max_pending:
+                future = submit_next()
+                if future is None:
+                    break
+                pending.append(future)
+
+            while pending:
+                yield pending.popleft().result()
+                future = submit_next()
+                if future is not None:
+                    pending.append(future)
+        else:
+            pending = set()
+            while len(pending) < max_pending:
+                future = submit_next()
+                if future is None:
+                    break
+                pending.add(future)
+
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+                    next_future = submit_next()
+                    if next_future is not None:
+                        pending.add(next_future)
+
+class ClassifierSession:
+    def __init__(self, model_path='./models/recyclable_classifier.tflite',
+                 labels_path='./models/class_names.txt',
+                 num_threads=None, cache=None, use_tensor_view=True):
+        self.model_path = model_path
+        self.labels = load_labels(labels_path)
+        self.cache = cache
+        self.use_tensor_view = use_tensor_view
+
+        _, tflite, _ = load_runtime()
+        load_start = time.perf_counter()
+        self.interpreter = tflite.Interpreter(model_path=model_path,
+                                              num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.load_seconds = time.perf_counter() - load_start
+
+        self.refresh_details()
+        self.input_shape = self.input_details['shape']
+        self.batch_size = int(self.input_shape[0])
+        self.input_dtype = self.input_details['dtype']
+        self.output_dtype = self.output_details['dtype']
+        self.input_scale, self.input_zero_point = self.input_details['quantization']
+        self.output_scale, self.output_zero_point = self.output_details['quantization']
+        self.input_quantized = np.issubdtype(self.input_dtype, np.integer)
+        self.output_quantized = np.issubdtype(self.output_dtype, np.integer)
+        self.allocate_buffers()
+
+    def allocate_buffers(self):
+        shape = tuple(int(dim) for dim in self.input_details['shape'])
+        self.input_buffer = np.zeros(shape, dtype=np.float32)
+        if self.input_quantized:
+            self.quantize_scratch = np.empty(shape, dtype=np.float32)
+            self.quantized_buffer = np.empty(shape, dtype=self.input_dtype)
+
+    def refresh_details(self):
+        self.input_details = self.interpreter.get_input_details()[0]
+        self.output_details = self.interpreter.get_output_details()[0]
+
+    def supports_batching(self):
+        signature = self.input_details.get('shape_signature')
+        return signature is None or len(signature) == 0 or signature[0] == -1
+
+    def set_batch_size(self, batch_size):
+        if batch_size == self.batch_size:
+            return True
+        if not self.supports_batching():
+            return False
+
+        shape = [batch_size] + [int(dim) for dim in self.input_shape[1:]]
+        try:
+            self.interpreter.resize_tensor_input(self.input_details['index'], shape)
+            self.interpreter.allocate_tensors()
+        except (RuntimeError, ValueError) as e:
+            print(f"Batch size {batch_size} not supported by model ({e}), using 1")
+            self.interpreter.resize_tensor_input(self.input_details['index'],
+                                                 [self.batch_size] + shape[1:])
+            self.interpreter.allocate_tensors()
+            self.refresh_details()
+            return False
+
+        self.refresh_details()
+        self.batch_size = batch_size
+        self.allocate_buffers()
+        return True
+
+    def quantize(self, input_data, out=None):
+        if not self.input_quantized:
+            return input_data
+
+        if out is None or out.shape != input_data.shape:
+            scratch = np.empty(input_data.shape, dtype=np.float32)
+            out = np.empty(input_data.shape, dtype=self.input_dtype)
+        else:
+            scratch = self.quantize_scratch
+
+        info = np.iinfo(self.input_dtype)
+        np.multiply(input_data, 1.0 / self.input_scale, out=scratch, dtype=np.float32)
+        scratch += self.input_zero_point
+        np.rint(scratch, out=scratch)
+        np.clip(scratch, info.min, info.max, out=scratch)
+        np.copyto(out, scratch, casting='unsafe')
+        return out
+
+    def dequantize(self, output_data):
+        if not self.output_quantized:
+            return output_data
+
+        result = np.subtract(output_data, self.output_zero_point, dtype=np.float32)
+        result *= self.output_scale
+        return result
+
+    def write_input(self, data):
+        index = self.input_details['index']
+        if self.use_tensor_view:
+            try:
+                # Write straight into the interpreter's tensor; the view must not
+                # outlive this statement or invoke() refuses to run
+                np.copyto(self.interpreter.tensor(index)(), data, casting='unsafe')
+                return
+            except (RuntimeError, ValueError):
+                self.use_tensor_view = False
+        self.interpreter.set_tensor(index, data)
+
+    def invoke(self, input_data):
+        if self.input_quantized:
+            input_data = self.quantize(input_data, out=self.quantized_buffer)
+        elif input_data.dtype != self.input_dtype:
+            input_data = input_data.astype(self.input_dtype)
+
+        self.write_input(input_data)
+        self.interpreter.invoke()
+        output_data = self.interpreter.get_tensor(self.output_details['index'])
+        return self.dequantize(output_data)
+
+    def predict(self, input_data):
+        if input_data.ndim == 3:
+            input_data = np.expand_dims(input_data, axis=0)
+        if self.batch_size != 1:
+            self.set_batch_size(1)
+        return self.invoke(input_data)[0]
+
+    def predict_image(self, image):
+        if self.batch_size != 1:
+            self.set_batch_size(1)
+        preprocess_into(image, self.input_buffer[0])
+        return self.invoke(self.input_buffer)[0]
+
+    def predict_batch(self, batch):
+        if self.set_batch_size(len(batch)):
+            return self.invoke(batch)
+        return np.stack([self.invoke(batch[i:i + 1])[0] for i in range(len(batch))])
+
+    def predict_path(self, image_path):
+        if self.cache is None:
+            return self.predict_image(Image.open(image_path))
+
+        key = self.cache.key_for_path(image_path)
+        predictions = self.cache.get(key)
+        if predictions is None:
+            predictions = self.predict_image(Image.open(image_path))
+            self.cache.put(key, predictions)
+        return predictions
+
+    def predict_frame(self, frame):
+        if self.cache is None or not isinstance(frame, np.ndarray):
+            return self.predict_image(frame)
+
+        key = self.cache.key_for_array(frame)
+        predictions = self.cache.get(key)
+        if predictions is None:
+            predictions = self.predict_image(frame)
+            self.cache.put(key, predictions)
+        return predictions
+
+    def classify(self, predictions):
+        idx = int(np.argmax(predictions))
+        return self.labels[idx], float(predictions[idx]) * 100
+
+    def top_k(self, predictions, k=3):
+        indices = np.argsort(predictions)[-k:][::-1]
+        return [(self.labels[idx], float(predictions[idx]) * 100) for idx in indices]
+
+class InterpreterPool:
+    def __init__(self, model_path='./models/recyclable_classifier.tflite',
+                 labels_path='./models/class_names.txt',
+                 size=2, num_threads=1, cache=None):
+        self.sessions = [ClassifierSession(model_path, labels_path, num_threads=num_threads,
+                                           cache=cache)
+                         for _ in range(size)]
+        self.cache = cache
+        self.num_threads = num_threads
+        self.available = queue.Queue()
+        for session in self.sessions:
+            self.available.put(session)
+        self.executor = ThreadPoolExecutor(max_workers=size)
+
+        self.model_path = model_path
+        self.labels = self.sessions[0].labels
+        self.input_shape = self.sessions[0].input_shape
+        self.classify = self.sessions[0].classify
+        self.top_k = self.sessions[0].top_k
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def _run(self, method, *args):
+        session = self.available.get()
+        try:
+            return getattr(session, method)(*args)
+        finally:
+            self.available.put(session)
+
+    def set_batch_size(self, batch_size):
+        return all(session.set_batch_size(batch_size) for session in self.sessions)
+
+    def predict(self, input_data):
+        return self._run('predict', input_data)
+
+    def predict_batch(self, batch):
+        return self._run('predict_batch', batch)
+
+    def predict_path(self, image_path):
+        return self._run('predict_path', image_path)
+
+    def predict_frame(self, frame):
+        return self._run('predict_frame', frame)
+
+    def submit(self, input_data):
+        return self.executor.submit(self._run, 'predict', input_data)
+
+    def submit_batch(self, batch):
+        return self.executor.submit(self._run, 'predict_batch', batch)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+def sweep_pool_configs(model_path='./models/recyclable_classifier.tflite',
+                       labels_path='./models/class_names.txt',
+                       total_threads=None, num_images=64, batch_size=1):
+    total_threads = total_threads or os.cpu_count() or 1
+    configs = [(size, threads)
+               for size in range(1, total_threads + 1)
+               for threads in range(1, total_threads + 1)
+               if size * threads <= total_threads]
+
+    print(f"Sweeping {len(configs)} pool configurations on {total_threads} cores...")
+    print(f"{'pool size':>10} {'threads':>8} {'images/sec':>12}")
+    print("-" * 32)
 
-    output_data = interpreter.get_tensor(output_details[0]['index'])
+    results = []
+    for size, threads in configs:
+        pool = InterpreterPool(model_path, labels_path, size=size, num_threads=threads)
+        if batch_size > 1 and not pool.set_batch_size(batch_size):
+            batch_size = 1
+        shape = [batch_size] + [int(dim) for dim in pool.input_shape[1:]]
+        batch = np.random.default_rng(0).uniform(0, 255, shape).astype(np.float32)
+
+        # Warm up every interpreter before timing
+        for future in [pool.submit_batch(batch) for _ in range(size)]:
+            future.result()
+
+        num_batches = max(1, num_images // batch_size)
+        start = time.perf_counter()
+        for future in [pool.submit_batch(batch) for _ in range(num_batches)]:
+            future.result()
+        elapsed = time.perf_counter() - start
+        pool.close()
+
+        throughput = num_batches * batch_size / elapsed
+        results.append({'pool_size': size, 'num_threads': threads, 'images_per_sec': throughput})
+        print(f"{size:>10} {threads:>8} {throughput:>12.1f}")
+
+    best = max(results, key=lambda r: r['images_per_sec'])
+    print(f"\nBest: pool size {best['pool_size']} x {best['num_threads']} threads "
+          f"({best['images_per_sec']:.1f} images/sec)")
+    return best, results
 
-    if output_details[0]['dtype'] == np.uint8:
-        output_scale, output_zero_point = output_details[0]['quantization']
-        output_data = (output_data.astype(np.float32) - output_zero_point) * output_scale
+def run_inference(model_path='./models/recyclable_classifier.tflite',
+                 image_path='./sample.jpg',
+                 labels_path='./models/class_names.txt',
+                 session=None):
+    if session is None:
+        print(f"Loading TFLite model from {model_path}...")
+        session = ClassifierSession(model_path, labels_path)
 
-    labels = load_labels(labels_path)
+    print(f"Input shape: {session.input_shape}")
+    print(f"Input type: {session.input_dtype}")
 
-    predictions = output_data[0]
-    top_k = 3
-    top_k_indices = np.argsort(predictions)[-top_k:][::-1]
+    print(f"Running inference on {image_path}...")
+    predictions = session.predict_path(image_path)
 
     print("\nPredictions:")
     print("-" * 40)
-    for i, idx in enumerate(top_k_indices, 1):
-        print(f"{i}. {labels[idx]}: {predictions[idx] * 100:.2f}%")
+    for i, (label, score) in enumerate(session.top_k(predictions, k=3), 1):
+        print(f"{i}. {label}: {score:.2f}%")
 
-    predicted_class = labels[np.argmax(predictions)]
-    confidence = np.max(predictions) * 100
+    predicted_class, confidence = session.classify(predictions)
 
     print("\n" + "=" * 40)
     print(f"RESULT: {predicted_class} ({confidence:.2f}% confidence)")
@@ -72,40 +429,147 @@ def run_inference(model_path='./models/recyclable_classifier.tflite',
 
     return predicted_class, confidence
 
-def batch_inference(model_path='./models/recyclable_classifier.tflite',
-                   image_dir='./test_images',
-                   labels_path='./models/class_names.txt'):
-    interpreter = tflite.Interpreter(model_path=model_path)
-    interpreter.allocate_tensors()
-
-    input_details = interpreter.get_input_details()
-    output_details = interpreter.get_output_details()
-    labels = load_labels(labels_path)
-
-    results = []
-
-    for image_file in os.listdir(image_dir):
-        if image_file.lower().endswith(('.png', '.jpg', '.jpeg')):
-            image_path = os.path.join(image_dir, image_file)
-
-            input_data = preprocess_image(image_path, input_details[0]['shape'])
-
-            if input_details[0]['dtype'] == np.uint8:
-                input_scale, input_zero_point = input_details[0]['quantization']
-                input_data = input_data / input_scale + input_zero_point
-                input_data = input_data.astype(np.uint8)
-
-            interpreter.set_tensor(input_details[0]['index'], input_data)
-            interpreter.invoke()
-            output_data = interpreter.get_tensor(output_details[0]['index'])
-
-            if output_details[0]['dtype'] == np.uint8:
-                output_scale, output_zero_point = output_details[0]['quantization']
-                output_data = (output_data.astype(np.float32) - output_zero_point) * output_scale
-
-            predictions = output_data[0]
-            predicted_class = labels[np.argmax(predictions)]
-            confidence = np.max(predictions) * 100
+def scan_images(image_dir, recursive=True):
+    directories = [image_dir]
+    while directories:
+        directory = directories.pop()
+        with os.scandir(directory) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+
+        subdirectories = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if recursive:
+                    subdirectories.append(entry.path)
+            elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                yield entry.path
+
+        directories.extend(reversed(subdirectories))
+
+def load_scored(output_path):
+    # Images that only have error rows are left out so a resumed run retries them
+    scored = set()
+    if not os.path.exists(output_path):
+        return scored
+
+    with open(output_path, 'r', newline='') as f:
+        if output_path.lower().endswith('.csv'):
+            for row in csv.DictReader(f):
+                if row.get('image') and not row.get('error'):
+                    scored.add(row['image'])
+        else:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    if not record.get('error'):
+                        scored.add(record['image'])
+                except (ValueError, KeyError, AttributeError):
+                    # A run killed mid-write can leave a truncated last line
+                    continue
+    return scored
+
+class ResultWriter:
+    fields = ['image', 'class', 'confidence', 'error']
+
+    def __init__(self, output_path, flush_every=100):
+        self.output_path = output_path
+        self.flush_every = flush_every
+        self.format = 'csv' if output_path.lower().endswith('.csv') else 'jsonl'
+        self.pending = 0
+
+        output_dir = os.path.dirname(output_path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        is_new = not os.path.exists(output_path) or os.path.getsize(output_path) == 0
+
+        fields = self.fields
+        if not is_new:
+            with open(output_path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b'\n'
+            if self.format == 'csv':
+                with open(output_path, 'r', newline='') as f:
+                    # Keep appending in the column layout the file already has
+                    fields = next(csv.reader(f), None) or fields
+
+        self.file = open(output_path, 'a', newline='')
+        if not is_new and needs_newline:
+            # Terminate a line truncated by a killed run so the next record
+            # is not glued onto it
+            self.file.write('\n')
+        if self.format == 'csv':
+            self.writer = csv.DictWriter(self.file, fieldnames=fields, extrasaction='ignore')
+            if is_new:
+                self.writer.writeheader()
+
+    def write(self, result):
+        if self.format == 'csv':
+            self.writer.writerow(result)
+        else:
+            self.file.write(json.dumps(result) + '\n')
+
+        self.pending += 1
+        if self.pending >= self.flush_every:
+            self.file.flush()
+            self.pending = 0
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def iter_batch_inference(session, image_dir='./test_images',
+                         batch_size=1, workers=1, ordered=True,
+                         use_processes=False, recursive=False,
+                         skip=None, verbose=True):
+    skip = skip or set()
+    cache = getattr(session, 'cache', None)
+    cached = deque()
+    failed = deque()
+    cache_keys = {}
+
+    def uncached(image_paths):
+        for image_path in image_paths:
+            if os.path.relpath(image_path, image_dir) in skip:
+                continue
+            if cache is not None:
+                try:
+                    key = cache.key_for_path(image_path)
+                except OSError as e:
+                    failed.append((image_path, f"{type(e).__name__}: {e}"))
+                    continue
+                predictions = cache.get(key)
+                if predictions is not None:
+                    cached.append((image_path, predictions))
+                    continue
+                cache_keys[image_path] = key
+            yield image_path
+
+    image_paths = uncached(scan_images(image_dir, recursive=recursive))
+
+    if batch_size > 1 and not session.set_batch_size(batch_size):
+        batch_size = 1
+
+    height, width = int(session.input_shape[1]), int(session.input_shape[2])
+    buffer = np.zeros((batch_size, height, width, 3), dtype=np.float32)
+
+    chunk = []
+    pending = deque()
+    scored = 0
+    errors = 0
+    start_time = time.perf_counter()
+
+    def make_results(image_paths, outputs):
+        results = []
+        for image_path, predictions in zip(image_paths, outputs):
+            image_file = os.path.relpath(image_path, image_dir)
+            predicted_class, confidence = session.classify(predictions)
+            if image_path in cache_keys:
+                cache.put(cache_keys.pop(image_path), predictions)
 
             results.append({
                 'image': image_file,
@@ -113,16 +577,286 @@ def batch_inference(model_path='./models/recyclable_classifier.tflite',
                 'confidence': confidence
             })
 
-            print(f"{image_file}: {predicted_class} ({confidence:.2f}%)")
+            if verbose:
+                print(f"{image_file}: {predicted_class} ({confidence:.2f}%)")
+        return results
+
+    def score_chunk():
+        # Pad the final partial batch instead of resizing the tensor again
+        buffer[len(chunk):] = 0
+        image_paths = list(chunk)
+        chunk.clear()
+
+        if isinstance(session, InterpreterPool):
+            pending.append((image_paths, session.submit_batch(buffer.copy())))
+            results = []
+            while len(pending) > len(session):
+                image_paths, future = pending.popleft()
+                results.extend(make_results(image_paths, future.result()))
+            return results
+        return make_results(image_paths, session.predict_batch(buffer))
+
+    preprocessed = iter_preprocessed(image_paths, session.input_shape, workers=workers,
+                                     ordered=ordered, use_processes=use_processes)
+    def drain_cached():
+        while cached:
+            image_path, predictions = cached.popleft()
+            yield from make_results([image_path], [predictions])
+
+    def drain_failed():
+        # Error rows are checkpointed like results so a resumed run skips them
+        while failed:
+            image_path, error = failed.popleft()
+            image_file = os.path.relpath(image_path, image_dir)
+            print(f"{image_file}: skipped ({error})")
+            yield {'image': image_file, 'class': None, 'confidence': None, 'error': error}
+
+    for image_path, input_data, error in preprocessed:
+        if error is not None:
+            failed.append((image_path, error))
+        else:
+            buffer[len(chunk)] = input_data
+            chunk.append(image_path)
+            if len(chunk) == batch_size:
+                for result in score_chunk():
+                    scored += 1
+                    yield result
+        for result in drain_cached():
+            scored += 1
+            yield result
+        for result in drain_failed():
+            errors += 1
+            yield result
+
+    for result in drain_cached():
+        scored += 1
+        yield result
+    for result in drain_failed():
+        errors += 1
+        yield result
+    if chunk:
+        for result in score_chunk():
+            scored += 1
+            yield result
+    while pending:
+        image_paths, future = pending.popleft()
+        for result in make_results(image_paths, future.result()):
+            scored += 1
+            yield result
+
+    elapsed = time.perf_counter() - start_time
+    if scored and elapsed > 0:
+        print(f"\nScored {scored} images in {elapsed:.2f}s "
+              f"({scored / elapsed:.1f} images/sec, batch size {batch_size})")
+    if errors:
+        print(f"Skipped {errors} unreadable images")
+    if cache is not None:
+        stats = cache.stats()
+        print(f"Cache: {stats['hits_memory']} memory hits, {stats['hits_disk']} disk hits, "
+              f"{stats['misses']} misses ({stats['hit_rate'] * 100:.1f}% hit rate)")
 
-    return results
+def batch_inference(model_path='./models/recyclable_classifier.tflite',
+                   image_dir='./test_images',
+                   labels_path='./models/class_names.txt',
+                   session=None,
+                   batch_size=1,
+                   workers=1,
+                   ordered=True,
+                   use_processes=False,
+                   recursive=False,
+                   output_path=None,
+                   resume=True,
+                   collect=True):
+    if session is None:
+        session = ClassifierSession(model_path, labels_path)
+
+    skip = set()
+    if output_path and resume:
+        skip = load_scored(output_path)
+        if skip:
+            print(f"Resuming: skipping {len(skip)} already-scored images")
+
+    stream = iter_batch_inference(session, image_dir, batch_size=batch_size,
+                                  workers=workers, ordered=ordered,
+                                  use_processes=use_processes, recursive=recursive,
+                                  skip=skip)
+
+    if output_path is None:
+        return list(stream)
+
+    if not resume and os.path.exists(output_path):
+        os.remove(output_path)
 
-if __name__ == "__main__":
-    import sys
+    results = []
+    with ResultWriter(output_path) as writer:
+        for result in stream:
+            writer.write(result)
+            if collect:
+                results.append(result)
 
-    if len(sys.argv) > 1:
-        image_path = sys.argv[1]
-        run_inference(image_path=image_path)
+    return results
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Classify recyclable items with a TFLite model'
+    )
+    parser.add_argument(
+        'image_path',
+        nargs='?',
+        help='Path to an image, or a directory of images for batch scoring'
+    )
+    parser.add_argument(
+        '--model',
+        default='./models/recyclable_classifier.tflite',
+        help='Path to TFLite model'
+    )
+    parser.add_argument(
+        '--labels',
+        default='./models/class_names.txt',
+        help='Path to class labels file'
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=1,
+        help='Images per invoke() when scoring a directory'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Parallel image decoding/preprocessing workers'
+    )
+    parser.add_argument(
+        '--processes',
+        action='store_true',
+        help='Use worker processes instead of threads for preprocessing'
+    )
+    parser.add_argument(
+        '--unordered',
+        action='store_true',
+        help='Score images in completion order rather than file order'
+    )
+    parser.add_argument(
+        '--pool-size',
+        type=int,
+        default=1,
+        help='Number of interpreters to run concurrently when scoring a directory'
+    )
+    parser.add_argument(
+        '--num-threads',
+        type=int,
+        default=None,
+        help='Threads per interpreter'
+    )
+    parser.add_argument(
+        '--sweep',
+        action='store_true',
+        help='Find the best pool size x threads split for this machine'
+    )
+    parser.add_argument(
+        '--recursive',
+        action='store_true',
+        help='Walk subdirectories when scoring a directory'
+    )
+    parser.add_argument(
+        '--output',
+        default=None,
+        help='Append results to this .jsonl or .csv file as they are produced'
+    )
+    parser.add_argument(
+        '--no-resume',
+        action='store_true',
+        help='Start over instead of skipping images already in --output'
+    )
+    parser.add_argument(
+        '--profile',
+        default=None,
+        metavar='TRACE_PATH',
+        help='Profile stages and ops for a single image and write a Chrome trace here'
+    )
+    parser.add_argument(
+        '--cache',
+        default=None,
+        help='SQLite file for the on-disk prediction cache (enables caching)'
+    )
+    parser.add_argument(
+        '--cache-size',
+        type=int,
+        default=1024,
+        help='Predictions kept in the in-memory LRU cache'
+    )
+    parser.add_argument(
+        '--cache-disk-size',
+        type=int,
+        default=100000,
+        help='Maximum predictions kept in the on-disk cache'
+    )
+    parser.add_argument(
+        '--startup-report',
+        action='store_true',
+        help='Print module import, interpreter runtime import and model load times'
+    )
+
+    args = parser.parse_args()
+
+    if args.sweep:
+        sweep_pool_configs(model_path=args.model,
+                           labels_path=args.labels,
+                           batch_size=args.batch_size)
+        return
+
+    if args.image_path is None:
+        parser.error('image_path is required unless --sweep is given')
+
+    if args.profile:
+        from profile_tflite import profile_inference
+        profile_inference(args.image_path,
+                          model_path=args.model,
+                          labels_path=args.labels,
+                          num_threads=args.num_threads,
+                          output_path=args.profile)
+        return
+
+    cache = None
+    if args.cache:
+        from prediction_cache import PredictionCache
+        cache = PredictionCache(args.model, max_memory_entries=args.cache_size,
+                                db_path=args.cache, max_disk_entries=args.cache_disk_size)
+
+    if os.path.isdir(args.image_path):
+        if args.pool_size > 1:
+            session = InterpreterPool(args.model, args.labels, size=args.pool_size,
+                                      num_threads=args.num_threads, cache=cache)
+        else:
+            session = ClassifierSession(args.model, args.labels, num_threads=args.num_threads,
+                                        cache=cache)
+        if args.startup_report:
+            first = session.sessions[0] if isinstance(session, InterpreterPool) else session
+            print(startup_report(first))
+        batch_inference(session=session,
+                        image_dir=args.image_path,
+                        batch_size=args.batch_size,
+                        workers=args.workers,
+                        ordered=not args.unordered,
+                        use_processes=args.processes,
+                        recursive=args.recursive,
+                        output_path=args.output,
+                        resume=not args.no_resume,
+                        collect=False)
+        if isinstance(session, InterpreterPool):
+            session.close()
     else:
-        print("Usage: python infer_tflite.py <image_path>")
-        print("Example: python infer_tflite.py ./sample.jpg")
+        session = ClassifierSession(args.model, args.labels, num_threads=args.num_threads,
+                                    cache=cache)
+        if args.startup_report:
+            print(startup_report(session))
+        run_inference(image_path=args.image_path, session=session)
+
+    if cache is not None:
+        cache.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,483 @@
+import asyncio
+import io
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from infer_tflite import ClassifierSession, preprocess_into
+from prediction_cache import PredictionCache
+
+STATUS_TEXT = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    500: 'Internal Server Error',
+    503: 'Service Unavailable',
+}
+
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def render(self, name, help_text):
+        lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for bound, count in zip(self.buckets, self.counts):
+            lines.append(f'{name}_bucket{{le="{bound:g}"}} {count}')
+        lines.append(f'{name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f'{name}_sum {self.sum:.6f}')
+        lines.append(f'{name}_count {self.count}')
+        return lines
+
+class Metrics:
+    def __init__(self, max_batch):
+        self.started = time.time()
+        self.requests = {}
+        self.cache_hits = 0
+        self.batches = 0
+        self.request_latency = Histogram(LATENCY_BUCKETS_MS)
+        self.queue_wait = Histogram(LATENCY_BUCKETS_MS)
+        self.inference_latency = Histogram(LATENCY_BUCKETS_MS)
+        self.batch_size = Histogram(range(1, max_batch + 1))
+
+    def count_request(self, path, status):
+        key = (path, status)
+        self.requests[key] = self.requests.get(key, 0) + 1
+
+    def render(self, queue_depth):
+        lines = [
+            '# HELP edge_ai_requests_total HTTP requests by path and status.',
+            '# TYPE edge_ai_requests_total counter',
+        ]
+        for (path, status), count in sorted(self.requests.items()):
+            lines.append(f'edge_ai_requests_total{{path="{path}",status="{status}"}} {count}')
+        lines += [
+            '# HELP edge_ai_cache_hits_total Predictions served from the prediction cache.',
+            '# TYPE edge_ai_cache_hits_total counter',
+            f'edge_ai_cache_hits_total {self.cache_hits}',
+            '# HELP edge_ai_batches_total Interpreter invokes.',
+            '# TYPE edge_ai_batches_total counter',
+            f'edge_ai_batches_total {self.batches}',
+            '# HELP edge_ai_queue_depth Decoded images waiting for a batch.',
+            '# TYPE edge_ai_queue_depth gauge',
+            f'edge_ai_queue_depth {queue_depth}',
+            '# HELP edge_ai_uptime_seconds Seconds since the server started.',
+            '# TYPE edge_ai_uptime_seconds gauge',
+            f'edge_ai_uptime_seconds {time.time() - self.started:.1f}',
+        ]
+        lines += self.request_latency.render('edge_ai_request_latency_ms',
+                                             'End-to-end /predict latency in milliseconds.')
+        lines += self.queue_wait.render('edge_ai_queue_wait_ms',
+                                        'Time a decoded image waited for its batch.')
+        lines += self.inference_latency.render('edge_ai_inference_latency_ms',
+                                               'Interpreter invoke time per batch.')
+        lines += self.batch_size.render('edge_ai_batch_size', 'Images per interpreter invoke.')
+        return '\n'.join(lines) + '\n'
+
+def batch_buckets(max_batch):
+    buckets = []
+    size = 1
+    while size < max_batch:
+        buckets.append(size)
+        size *= 2
+    return buckets + [max_batch]
+
+class MicroBatcher:
+    """Coalesces concurrent requests into one invoke of up to max_batch images.
+
+    A batch is dispatched as soon as it is full, or max_wait_ms after its first
+    image arrived, whichever comes first. Batches are padded up to the next
+    power-of-two bucket, so a lone request costs one image of compute while the
+    input tensor only ever takes a handful of shapes. With session_factory each
+    bucket gets its own interpreter, allocated once at that size.
+    """
+
+    def __init__(self, session, metrics, max_batch=8, max_wait_ms=5.0, max_queue=256,
+                 session_factory=None):
+        self.session = session
+        self.metrics = metrics
+        self.max_batch = max_batch if session.supports_batching() else 1
+        self.buckets = batch_buckets(self.max_batch)
+        self.sessions = {size: session for size in self.buckets}
+        if session_factory is not None:
+            for size in self.buckets:
+                if size != session.batch_size:
+                    self.sessions[size] = session_factory()
+                    self.sessions[size].set_batch_size(size)
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self.queue = None
+        self.height, self.width = int(session.input_shape[1]), int(session.input_shape[2])
+        # The interpreter is not thread-safe, so every invoke runs on one thread
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='invoke')
+        self.batch = np.empty((self.max_batch, self.height, self.width, 3), dtype=np.float32)
+        self.task = None
+
+    def start(self):
+        # Created here so the queue binds to the running loop on Python < 3.10
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+        self.task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        self.executor.shutdown(wait=True)
+
+    async def predict(self, image_array):
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((image_array, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            raise HttpError(503, 'Inference queue is full')
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(items) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            dispatched = time.perf_counter()
+            for _, _, enqueued in items:
+                self.metrics.queue_wait.observe((dispatched - enqueued) * 1000)
+
+            try:
+                predictions, invoke_ms = await loop.run_in_executor(
+                    self.executor, self._invoke, [item[0] for item in items])
+            except Exception as e:
+                for _, future, _ in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.metrics.batches += 1
+            self.metrics.batch_size.observe(len(items))
+            self.metrics.inference_latency.observe(invoke_ms)
+            for (_, future, _), prediction in zip(items, predictions):
+                if not future.done():
+                    future.set_result((prediction, len(items)))
+
+    def bucket_for(self, count):
+        return next(size for size in self.buckets if size >= count)
+
+    def warm_up(self):
+        for size, session in self.sessions.items():
+            session.predict_batch(self.batch[:size])
+
+    def _invoke(self, arrays):
+        count = len(arrays)
+        size = self.bucket_for(count)
+        for i, array in enumerate(arrays):
+            self.batch[i] = array
+        self.batch[count:size] = 0
+        start = time.perf_counter()
+        predictions = self.sessions[size].predict_batch(self.batch[:size])
+        return predictions[:count], (time.perf_counter() - start) * 1000
+
+class InferenceServer:
+    def __init__(self, session, max_batch=8, max_wait_ms=5.0, max_queue=256,
+                 decode_workers=2, max_body_bytes=10 * 1024 * 1024, cache=None, top_k=3,
+                 session_factory=None):
+        self.session = session
+        self.cache = cache
+        self.top_k = top_k
+        self.max_body_bytes = max_body_bytes
+        self.metrics = Metrics(max_batch)
+        self.batcher = MicroBatcher(session, self.metrics, max_batch=max_batch,
+                                    max_wait_ms=max_wait_ms, max_queue=max_queue,
+                                    session_factory=session_factory)
+        self.decode_executor = ThreadPoolExecutor(max_workers=decode_workers,
+                                                  thread_name_prefix='decode')
+
+    def _decode(self, body):
+        key = None
+        if self.cache is not None:
+            key = self.cache.key_for_bytes(body)
+            predictions = self.cache.get(key)
+            if predictions is not None:
+                return key, None, predictions
+
+        out = np.empty((self.batcher.height, self.batcher.width, 3), dtype=np.float32)
+        try:
+            preprocess_into(Image.open(io.BytesIO(body)), out)
+        except OSError as e:
+            raise HttpError(400, f'Could not decode image: {e}')
+        return key, out, None
+
+    async def handle_predict(self, body):
+        if not body:
+            raise HttpError(400, 'Request body must contain image bytes')
+
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        key, image_array, predictions = await loop.run_in_executor(
+            self.decode_executor, self._decode, body)
+
+        batch_size = 0
+        if predictions is None:
+            predictions, batch_size = await self.batcher.predict(image_array)
+            if self.cache is not None:
+                await loop.run_in_executor(self.decode_executor, self.cache.put, key, predictions)
+        else:
+            self.metrics.cache_hits += 1
+
+        latency_ms = (time.perf_counter() - start) * 1000
+        self.metrics.request_latency.observe(latency_ms)
+
+        label, confidence = self.session.classify(predictions)
+        return {
+            'label': label,
+            'confidence': round(confidence, 2),
+            'top_k': [{'label': name, 'confidence': round(score, 2)}
+                      for name, score in self.session.top_k(predictions, self.top_k)],
+            'batch_size': batch_size,
+            'cached': batch_size == 0,
+            'latency_ms': round(latency_ms, 3),
+        }
+
+    def handle_health(self):
+        return {
+            'status': 'ok',
+            'model': os.path.basename(self.session.model_path),
+            'input_shape': [int(dim) for dim in self.session.input_shape[1:]],
+            'input_dtype': str(np.dtype(self.session.input_dtype)),
+            'labels': self.session.labels,
+            'max_batch': self.batcher.max_batch,
+            'batch_buckets': self.batcher.buckets,
+            'max_wait_ms': self.batcher.max_wait * 1000,
+            'queue_depth': self.batcher.queue.qsize(),
+        }
+
+    async def route(self, method, path, body):
+        if path == '/predict':
+            if method != 'POST':
+                raise HttpError(405, 'Use POST with the image bytes as the request body')
+            return 200, 'application/json', json.dumps(await self.handle_predict(body))
+        if path == '/health':
+            return 200, 'application/json', json.dumps(self.handle_health())
+        if path == '/metrics':
+            return (200, 'text/plain; version=0.0.4',
+                    self.metrics.render(self.batcher.queue.qsize()))
+        raise HttpError(404, f'No route for {path}')
+
+    async def read_request(self, reader):
+        head = await reader.readuntil(b'\r\n\r\n')
+        request_line, *header_lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, version = request_line.split(' ')
+        except ValueError:
+            raise HttpError(400, 'Malformed request line')
+
+        headers = {}
+        for line in header_lines:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get('content-length', 0) or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise HttpError(400, 'Invalid Content-Length header')
+        if length > self.max_body_bytes:
+            raise HttpError(413, f'Body exceeds {self.max_body_bytes} bytes')
+        body = await reader.readexactly(length) if length else b''
+
+        keep_alive = (headers.get('connection', '').lower() != 'close'
+                      and version == 'HTTP/1.1')
+        return method, target.split('?', 1)[0], body, keep_alive
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    method, path, body, keep_alive = await self.read_request(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    method, path, keep_alive = None, None, False
+                    status, content_type, payload = 400, 'application/json', json.dumps(
+                        {'error': 'Request headers too large'})
+                except HttpError as e:
+                    method, path, keep_alive = None, None, False
+                    status, content_type, payload = e.status, 'application/json', json.dumps(
+                        {'error': e.message})
+                else:
+                    try:
+                        status, content_type, payload = await self.route(method, path, body)
+                    except HttpError as e:
+                        status, content_type, payload = e.status, 'application/json', json.dumps(
+                            {'error': e.message})
+                    except Exception as e:
+                        status, content_type, payload = 500, 'application/json', json.dumps(
+                            {'error': str(e)})
+
+                if path in ('/predict', '/health', '/metrics'):
+                    self.metrics.count_request(path, status)
+
+                data = payload.encode()
+                writer.write(
+                    f'HTTP/1.1 {status} {STATUS_TEXT.get(status, "")}\r\n'
+                    f'Content-Type: {content_type}\r\n'
+                    f'Content-Length: {len(data)}\r\n'
+                    f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'.encode()
+                    + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8080):
+        self.batcher.start()
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"Serving {self.session.model_path} on http://{host}:{port} "
+              f"(max batch {self.batcher.max_batch}, max wait {self.batcher.max_wait * 1000:g} ms)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.batcher.stop()
+            self.decode_executor.shutdown(wait=True)
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Serve the TFLite classifier over HTTP with dynamic micro-batching'
+    )
+    parser.add_argument(
+        '--model',
+        default='./models/recyclable_classifier.tflite',
+        help='Path to TFLite model'
+    )
+    parser.add_argument(
+        '--labels',
+        default='./models/class_names.txt',
+        help='Path to class labels file'
+    )
+    parser.add_argument(
+        '--host',
+        default='127.0.0.1',
+        help='Interface to bind (use 0.0.0.0 to serve the local network)'
+    )
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=8080,
+        help='Port to listen on'
+    )
+    parser.add_argument(
+        '--max-batch',
+        type=int,
+        default=8,
+        help='Most images coalesced into one invoke()'
+    )
+    parser.add_argument(
+        '--max-wait-ms',
+        type=float,
+        default=5.0,
+        help='Longest a request waits for its batch to fill'
+    )
+    parser.add_argument(
+        '--max-queue',
+        type=int,
+        default=256,
+        help='Decoded images allowed to wait before requests are rejected with 503'
+    )
+    parser.add_argument(
+        '--decode-workers',
+        type=int,
+        default=2,
+        help='Threads decoding and resizing request images'
+    )
+    parser.add_argument(
+        '--num-threads',
+        type=int,
+        default=None,
+        help='Interpreter num_threads'
+    )
+    parser.add_argument(
+        '--max-body-mb',
+        type=float,
+        default=10,
+        help='Largest accepted request body'
+    )
+    parser.add_argument(
+        '--cache',
+        default=None,
+        metavar='DB_PATH',
+        help='Persist predictions in this SQLite file, keyed on image bytes'
+    )
+    parser.add_argument(
+        '--cache-size',
+        type=int,
+        default=1024,
+        help='In-memory prediction cache entries (0 disables caching)'
+    )
+
+    args = parser.parse_args()
+
+    def load_session():
+        return ClassifierSession(args.model, args.labels, num_threads=args.num_threads)
+
+    session = load_session()
+    cache = None
+    if args.cache or args.cache_size > 0:
+        cache = PredictionCache(args.model, max_memory_entries=args.cache_size,
+                                db_path=args.cache)
+
+    server = InferenceServer(session, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms,
+                             max_queue=args.max_queue, decode_workers=args.decode_workers,
+                             max_body_bytes=int(args.max_body_mb * 1024 * 1024), cache=cache,
+                             session_factory=load_session)
+    # Warm every bucket so the first request pays for neither tensor allocation
+    # nor lazy kernel initialization
+    server.batcher.warm_up()
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\nShutting down")
+    finally:
+        if cache is not None:
+            cache.close()
+
+if __name__ == "__main__":
+    main()
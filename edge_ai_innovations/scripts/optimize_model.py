@@ -0,0 +1,222 @@
+import json
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+from train import load_dataset, train_model
+from convert_tflite import convert_with_full_quantization, make_representative_dataset
+from infer_tflite import ClassifierSession
+
+try:
+    import tensorflow_model_optimization as tfmot
+except ImportError:
+    tfmot = None
+
+MODES = ['prune', 'qat', 'prune_qat']
+QUANTIZABLE_LAYERS = (keras.layers.Conv2D, keras.layers.DepthwiseConv2D, keras.layers.Dense)
+
+def _require_tfmot():
+    if tfmot is None:
+        raise ImportError("tensorflow-model-optimization is required for QAT/pruning: "
+                          "pip install tensorflow-model-optimization")
+
+def apply_pruning(model, target_sparsity=0.5, begin_step=0, end_step=1000):
+    _require_tfmot()
+    schedule = tfmot.sparsity.keras.PolynomialDecay(
+        initial_sparsity=0.0, final_sparsity=target_sparsity,
+        begin_step=begin_step, end_step=end_step
+    )
+    return tfmot.sparsity.keras.prune_low_magnitude(model, pruning_schedule=schedule)
+
+def apply_qat(model, preserve_sparsity=False):
+    _require_tfmot()
+
+    # Annotate only the weight layers; Rescaling/pooling/dropout have no
+    # QAT support, so their int8 ranges come from calibration at export time
+    def annotate(layer):
+        if isinstance(layer, QUANTIZABLE_LAYERS):
+            return tfmot.quantization.keras.quantize_annotate_layer(layer)
+        return layer
+
+    annotated = keras.models.clone_model(model, clone_function=annotate)
+    annotated.set_weights(model.get_weights())
+
+    if preserve_sparsity:
+        scheme = tfmot.experimental.combine.Default8BitPrunePreserveQuantizeScheme()
+        return tfmot.quantization.keras.quantize_apply(annotated, scheme)
+    return tfmot.quantization.keras.quantize_apply(annotated)
+
+def _compile(model, learning_rate=1e-4):
+    model.compile(
+        optimizer=keras.optimizers.Adam(learning_rate),
+        loss='sparse_categorical_crossentropy',
+        metrics=['accuracy']
+    )
+
+def evaluate_tflite(model_path, labels_path, val_ds, latency_runs=50):
+    session = ClassifierSession(model_path, labels_path)
+
+    correct = total = 0
+    sample = None
+    for images, labels in val_ds:
+        images = images.numpy().astype(np.float32)
+        predictions = session.predict_batch(images)
+        correct += int(np.sum(np.argmax(predictions, axis=1) == labels.numpy()))
+        total += len(images)
+        if sample is None:
+            sample = images[0]
+
+    latencies_ms = []
+    for _ in range(latency_runs):
+        start = time.perf_counter()
+        session.predict(sample)
+        latencies_ms.append((time.perf_counter() - start) * 1000)
+
+    return {
+        'model': model_path,
+        'size_kb': os.path.getsize(model_path) / 1024,
+        'accuracy': correct / total if total else 0.0,
+        'latency_p50_ms': float(np.percentile(latencies_ms, 50)),
+        'latency_p95_ms': float(np.percentile(latencies_ms, 95)),
+    }
+
+def train_optimized(mode='prune_qat', base_model_path='./models/recyclable_classifier.h5',
+                    epochs=3, target_sparsity=0.5, data_dir='./data', batch_size=32,
+                    output_dir='./models', labels_path='./models/class_names.txt',
+                    num_calibration_samples=200):
+    _require_tfmot()
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode '{mode}', choose from {MODES}")
+
+    if not os.path.exists(base_model_path):
+        print(f"{base_model_path} not found, training a baseline model first...")
+        train_model(save_path=base_model_path, data_dir=data_dir, batch_size=batch_size)
+
+    base_model = keras.models.load_model(base_model_path)
+    img_height, img_width = base_model.input_shape[1], base_model.input_shape[2]
+    train_ds, val_ds, _ = load_dataset(data_dir, img_height, img_width, batch_size=batch_size)
+    steps_per_epoch = int(tf.data.experimental.cardinality(train_ds).numpy())
+    if steps_per_epoch < 0:
+        steps_per_epoch = 100
+
+    model = base_model
+    pruned = mode in ('prune', 'prune_qat')
+
+    if pruned:
+        print(f"Pruning to {target_sparsity * 100:.0f}% sparsity...")
+        model = apply_pruning(model, target_sparsity,
+                              end_step=max(1, steps_per_epoch * epochs))
+        _compile(model)
+        model.fit(train_ds, validation_data=val_ds, epochs=epochs,
+                  callbacks=[tfmot.sparsity.keras.UpdatePruningStep()])
+        model = tfmot.sparsity.keras.strip_pruning(model)
+
+    if mode in ('qat', 'prune_qat'):
+        print("Quantization-aware training...")
+        model = apply_qat(model, preserve_sparsity=pruned)
+        _compile(model)
+        model.fit(train_ds, validation_data=val_ds, epochs=epochs)
+
+    suffix = {'prune': 'pruned', 'qat': 'qat', 'prune_qat': 'pruned_qat'}[mode]
+    optimized_tflite = os.path.join(output_dir, f'recyclable_classifier_{suffix}.tflite')
+    calibration = make_representative_dataset(data_dir, num_calibration_samples,
+                                              img_height, img_width)
+
+    if mode == 'prune':
+        keras_path = os.path.join(output_dir, f'recyclable_classifier_{suffix}.h5')
+        model.save(keras_path)
+        convert_with_full_quantization(
+            model_path=keras_path, output_path=optimized_tflite, model=model, sparse=True,
+            representative_dataset=calibration
+        )
+    else:
+        # Calibration still covers the input Rescaling and pooling/flatten
+        # tensors that QAT leaves unannotated; learned QAT ranges take
+        # precedence wherever they exist
+        convert_with_full_quantization(output_path=optimized_tflite, model=model,
+                                       representative_dataset=calibration,
+                                       quantization_aware=True, sparse=pruned)
+
+    print("\nBuilding post-training quantized baseline for comparison...")
+    # Written next to the optimized model so the deployed
+    # recyclable_classifier_quant.tflite is never overwritten
+    ptq_tflite = os.path.join(output_dir, f'recyclable_classifier_{suffix}_ptq_baseline.tflite')
+    convert_with_full_quantization(
+        model_path=base_model_path, output_path=ptq_tflite,
+        representative_dataset=calibration
+    )
+
+    results = [
+        dict(variant='ptq_int8', **evaluate_tflite(ptq_tflite, labels_path, val_ds)),
+        dict(variant=f'{suffix}_int8', **evaluate_tflite(optimized_tflite, labels_path, val_ds)),
+    ]
+
+    print(f"\n{'variant':<18} {'size KB':>10} {'accuracy':>10} {'p50 ms':>10} {'p95 ms':>10}")
+    print("-" * 62)
+    for row in results:
+        print(f"{row['variant']:<18} {row['size_kb']:>10.1f} {row['accuracy'] * 100:>9.2f}% "
+              f"{row['latency_p50_ms']:>10.2f} {row['latency_p95_ms']:>10.2f}")
+
+    report_path = os.path.join(output_dir, f'optimization_report_{suffix}.json')
+    with open(report_path, 'w') as f:
+        json.dump({'mode': mode, 'target_sparsity': target_sparsity if pruned else None,
+                   'epochs': epochs, 'results': results}, f, indent=2)
+    print(f"\nReport saved to {report_path}")
+
+    return model, results
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Quantization-aware training and pruning for the edge model'
+    )
+    parser.add_argument(
+        '--mode',
+        choices=MODES,
+        default='prune_qat',
+        help='prune, qat, or prune followed by sparsity-preserving QAT'
+    )
+    parser.add_argument(
+        '--base-model',
+        default='./models/recyclable_classifier.h5',
+        help='Trained Keras model to fine-tune (trained from scratch if missing)'
+    )
+    parser.add_argument(
+        '--epochs',
+        type=int,
+        default=3,
+        help='Fine-tuning epochs per optimization stage'
+    )
+    parser.add_argument(
+        '--sparsity',
+        type=float,
+        default=0.5,
+        help='Final fraction of pruned weights'
+    )
+    parser.add_argument(
+        '--data-dir',
+        default='./data',
+        help='Dataset root containing train/<class>/ folders'
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=32,
+        help='Training batch size'
+    )
+
+    args = parser.parse_args()
+
+    train_optimized(mode=args.mode,
+                    base_model_path=args.base_model,
+                    epochs=args.epochs,
+                    target_sparsity=args.sparsity,
+                    data_dir=args.data_dir,
+                    batch_size=args.batch_size)
+
+if __name__ == "__main__":
+    main()
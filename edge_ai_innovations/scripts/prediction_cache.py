@@ -0,0 +1,176 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+def fingerprint_file(path, chunk_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class PredictionCache:
+    def __init__(self, model_path, max_memory_entries=1024,
+                 db_path=None, max_disk_entries=100000, commit_every=100):
+        self.model_fingerprint = fingerprint_file(model_path)
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.commit_every = commit_every
+        self.memory = OrderedDict()
+        # Disk writes are buffered and flushed in one short transaction, so no
+        # write lock is held between calls and other processes can share the file
+        self.pending_puts = {}
+        self.pending_touches = {}
+        self.retry_at = 0.0
+        self.lock = threading.Lock()
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+        self.db = None
+        if db_path:
+            db_dir = os.path.dirname(db_path)
+            if db_dir:
+                os.makedirs(db_dir, exist_ok=True)
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.execute(
+                'CREATE TABLE IF NOT EXISTS predictions ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, accessed REAL NOT NULL)'
+            )
+            self.db.execute('CREATE INDEX IF NOT EXISTS predictions_accessed '
+                            'ON predictions (accessed)')
+            self.db.commit()
+            self.disk_entries = self.db.execute('SELECT COUNT(*) FROM predictions').fetchone()[0]
+
+    def _key(self, *parts):
+        digest = hashlib.blake2b(self.model_fingerprint.encode(), digest_size=16)
+        for part in parts:
+            digest.update(part)
+        return digest.hexdigest()
+
+    def key_for_bytes(self, data):
+        return self._key(data)
+
+    def key_for_path(self, path):
+        with open(path, 'rb') as f:
+            return self._key(f.read())
+
+    def key_for_array(self, array):
+        array = np.ascontiguousarray(array)
+        return self._key(str(array.shape).encode(), array.dtype.str.encode(), array.data)
+
+    def get(self, key):
+        with self.lock:
+            predictions = self.memory.get(key)
+            if predictions is not None:
+                self.memory.move_to_end(key)
+                self.hits_memory += 1
+                return predictions
+
+            if self.db is not None:
+                predictions = self.pending_puts.get(key)
+                if predictions is None:
+                    try:
+                        row = self.db.execute('SELECT value FROM predictions WHERE key = ?',
+                                              (key,)).fetchone()
+                    except sqlite3.OperationalError:
+                        # Another process holds the database; treat it as a miss
+                        row = None
+                    if row is not None:
+                        predictions = np.frombuffer(row[0], dtype=np.float32)
+                        self.pending_touches[key] = time.time()
+                if predictions is not None:
+                    self._remember(key, predictions)
+                    self.hits_disk += 1
+                    return predictions
+
+            self.misses += 1
+            return None
+
+    def put(self, key, predictions):
+        predictions = np.asarray(predictions, dtype=np.float32)
+        with self.lock:
+            self._remember(key, predictions)
+
+            if self.db is not None:
+                self.pending_puts[key] = predictions
+                if (len(self.pending_puts) + len(self.pending_touches) >= self.commit_every
+                        and time.monotonic() >= self.retry_at):
+                    self._flush()
+
+    def _flush(self):
+        if not self.pending_puts and not self.pending_touches:
+            return
+        now = time.time()
+        try:
+            with self.db:
+                for key, predictions in self.pending_puts.items():
+                    row = (key, predictions.tobytes(), now)
+                    # INSERT OR REPLACE reports a row change for replacements
+                    # too, so insert and update separately to count new entries
+                    cursor = self.db.execute(
+                        'INSERT OR IGNORE INTO predictions (key, value, accessed) '
+                        'VALUES (?, ?, ?)', row
+                    )
+                    if cursor.rowcount != 1:
+                        self.db.execute('UPDATE predictions SET value = ?, accessed = ? '
+                                        'WHERE key = ?', row[1:] + row[:1])
+                self.db.executemany('UPDATE predictions SET accessed = ? WHERE key = ?',
+                                    [(accessed, key) for key, accessed
+                                     in self.pending_touches.items()])
+        except sqlite3.OperationalError as e:
+            # Keep the puts for the next flush; access times are best-effort
+            print(f"Prediction cache busy ({e}), retrying later")
+            self.pending_touches.clear()
+            self.retry_at = time.monotonic() + 30.0
+            return
+
+        self.pending_puts.clear()
+        self.pending_touches.clear()
+        self.disk_entries = self.db.execute('SELECT COUNT(*) FROM predictions').fetchone()[0]
+        if self.disk_entries > self.max_disk_entries:
+            self._evict_disk()
+
+    def _remember(self, key, predictions):
+        self.memory[key] = predictions
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory_entries:
+            self.memory.popitem(last=False)
+
+    def _evict_disk(self):
+        # Trim 10% below the limit so eviction is not paid on every insert
+        target = int(self.max_disk_entries * 0.9)
+        try:
+            with self.db:
+                self.db.execute(
+                    'DELETE FROM predictions WHERE key IN ('
+                    'SELECT key FROM predictions ORDER BY accessed ASC LIMIT ?)',
+                    (self.disk_entries - target,)
+                )
+        except sqlite3.OperationalError:
+            return
+        self.disk_entries = self.db.execute('SELECT COUNT(*) FROM predictions').fetchone()[0]
+
+    def stats(self):
+        lookups = self.hits_memory + self.hits_disk + self.misses
+        return {
+            'hits_memory': self.hits_memory,
+            'hits_disk': self.hits_disk,
+            'misses': self.misses,
+            'hit_rate': (self.hits_memory + self.hits_disk) / lookups if lookups else 0.0,
+            'memory_entries': len(self.memory),
+            'disk_entries': self.disk_entries if self.db is not None else 0,
+        }
+
+    def close(self):
+        if self.db is not None:
+            with self.lock:
+                self._flush()
+                self.db.close()
+                self.db = None
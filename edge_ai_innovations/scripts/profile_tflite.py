@@ -0,0 +1,293 @@
+import csv
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from PIL import Image
+
+from infer_tflite import ClassifierSession
+
+STAGES = ['decode', 'resize', 'copy', 'quantize', 'set_input', 'invoke', 'postprocess']
+
+class TraceRecorder:
+    def __init__(self):
+        self.events = []
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+
+    def now_us(self):
+        return (time.perf_counter() - self.origin) * 1e6
+
+    def add(self, name, start_us, duration_us, category='stage', args=None):
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': start_us,
+            'dur': duration_us,
+            'pid': self.pid,
+            'tid': threading.get_ident(),
+        }
+        if args:
+            event['args'] = args
+        self.events.append(event)
+        return event
+
+    @contextmanager
+    def span(self, name, category='stage'):
+        start = self.now_us()
+        try:
+            yield
+        finally:
+            self.add(name, start, self.now_us() - start, category)
+
+    def save(self, output_path):
+        output_dir = os.path.dirname(output_path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        with open(output_path, 'w') as f:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, f)
+
+def _tensor_shapes(interpreter):
+    return {detail['index']: tuple(int(dim) for dim in detail['shape'])
+            for detail in interpreter.get_tensor_details()}
+
+def estimate_op_costs(interpreter):
+    # FLOP estimates used to split measured invoke time across ops when no
+    # native per-op profile is available
+    try:
+        # Private API, absent from some tflite_runtime builds
+        op_details = interpreter._get_ops_details()
+    except AttributeError:
+        print("Interpreter does not expose op details, skipping per-op trace events")
+        return []
+
+    shapes = _tensor_shapes(interpreter)
+    ops = []
+
+    for op in op_details:
+        inputs = [shapes.get(i, ()) for i in op['inputs'] if i >= 0]
+        outputs = [shapes.get(i, ()) for i in op['outputs'] if i >= 0]
+        out_elems = int(np.prod(outputs[0])) if outputs and outputs[0] else 0
+        name = op['op_name']
+
+        if name == 'CONV_2D' and len(inputs) > 1:
+            _, kh, kw, cin = inputs[1]
+            cost = 2 * out_elems * kh * kw * cin
+        elif name == 'DEPTHWISE_CONV_2D' and len(inputs) > 1:
+            cost = 2 * out_elems * inputs[1][1] * inputs[1][2]
+        elif name == 'FULLY_CONNECTED' and len(inputs) > 1:
+            cost = 2 * out_elems * inputs[1][-1]
+        elif name in ('MAX_POOL_2D', 'AVERAGE_POOL_2D'):
+            cost = out_elems * 4
+        else:
+            cost = max(out_elems, int(np.prod(inputs[0])) if inputs and inputs[0] else 1)
+
+        ops.append({'index': op['index'], 'op': name, 'cost': max(cost, 1)})
+
+    return ops
+
+def native_op_profile(model_path, num_threads=None, runs=20, binary=None):
+    binary = binary or shutil.which('benchmark_model')
+    if not binary:
+        return None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'ops.csv')
+        command = [binary, f'--graph={model_path}', f'--num_runs={runs}',
+                   '--enable_op_profiling=true', f'--profiling_output_csv_file={csv_path}']
+        if num_threads:
+            command.append(f'--num_threads={num_threads}')
+
+        try:
+            subprocess.run(command, check=True, capture_output=True, timeout=600)
+        except (OSError, subprocess.SubprocessError) as e:
+            print(f"benchmark_model failed ({e}), falling back to estimated op timing")
+            return None
+
+        with open(csv_path, newline='') as f:
+            ops = parse_op_profile_csv(f)
+        if not ops:
+            print("Could not parse the benchmark_model op profile, "
+                  "falling back to estimated op timing")
+        return ops or None
+
+def _normalize_column(name):
+    return name.strip().strip('[]').strip().lower().replace(' ', '_')
+
+def parse_op_profile_csv(lines):
+    # The profiling CSV holds several tables ("Run Order", "Top by Computation
+    # Time", "Summary by node type", ...), each introduced by a title line and
+    # its own header row. Only the Run Order table lists every op once, in
+    # execution order, which is what the trace needs.
+    rows = [[cell.strip() for cell in row] for row in csv.reader(lines)]
+
+    start = 0
+    for i, row in enumerate(rows):
+        if any('Run Order' in cell for cell in row):
+            start = i + 1
+            break
+
+    header = None
+    ops = []
+    for row in rows[start:]:
+        if header is None:
+            if row and _normalize_column(row[0]) == 'node_type':
+                header = [_normalize_column(cell) for cell in row]
+            continue
+        if not any(row) or len(row) < len(header):
+            # A blank line or the next section's title ends the table
+            break
+        record = dict(zip(header, row))
+        try:
+            ops.append({'op': record['node_type'], 'name': record.get('name', ''),
+                        'avg_ms': float(record['avg_ms'])})
+        except (KeyError, ValueError):
+            break
+    return ops
+
+def profile_inference(image_path, model_path='./models/recyclable_classifier.tflite',
+                      labels_path='./models/class_names.txt', runs=20, warmup=3,
+                      num_threads=None, output_path='./models/profile_trace.json',
+                      benchmark_binary=None):
+    session = ClassifierSession(model_path, labels_path, num_threads=num_threads)
+    if session.batch_size != 1:
+        session.set_batch_size(1)
+    height, width = int(session.input_shape[1]), int(session.input_shape[2])
+
+    native_ops = native_op_profile(model_path, num_threads, runs, benchmark_binary)
+    estimated_ops = None if native_ops else estimate_op_costs(session.interpreter)
+    if estimated_ops:
+        total_cost = sum(op['cost'] for op in estimated_ops)
+
+    recorder = TraceRecorder()
+    timings = {stage: [] for stage in STAGES}
+
+    for run in range(warmup + runs):
+        record = run >= warmup
+        marks = [recorder.now_us()]
+
+        img = Image.open(image_path).convert('RGB')
+        marks.append(recorder.now_us())
+        img = img.resize((width, height))
+        marks.append(recorder.now_us())
+        np.copyto(session.input_buffer[0], np.asarray(img), casting='unsafe')
+        marks.append(recorder.now_us())
+        input_data = session.input_buffer
+        if session.input_quantized:
+            input_data = session.quantize(input_data, out=session.quantized_buffer)
+        marks.append(recorder.now_us())
+        session.write_input(input_data)
+        marks.append(recorder.now_us())
+        session.interpreter.invoke()
+        marks.append(recorder.now_us())
+        predictions = session.dequantize(
+            session.interpreter.get_tensor(session.output_details['index']))[0]
+        session.classify(predictions)
+        marks.append(recorder.now_us())
+
+        if not record:
+            continue
+
+        run_event = recorder.add(f'inference #{run - warmup + 1}', marks[0],
+                                 marks[-1] - marks[0], category='run')
+        for stage, start, end in zip(STAGES, marks[:-1], marks[1:]):
+            timings[stage].append((end - start) / 1000)
+            recorder.add(stage, start, end - start)
+
+        invoke_start, invoke_end = marks[5], marks[6]
+        cursor = invoke_start
+        if native_ops:
+            total_ms = sum(op['avg_ms'] for op in native_ops) or 1.0
+            for op in native_ops:
+                duration = (invoke_end - invoke_start) * op['avg_ms'] / total_ms
+                recorder.add(op['op'], cursor, duration, category='op',
+                             args={'name': op['name'], 'avg_ms': op['avg_ms']})
+                cursor += duration
+        else:
+            for op in estimated_ops:
+                duration = (invoke_end - invoke_start) * op['cost'] / total_cost
+                recorder.add(op['op'], cursor, duration, category='op',
+                             args={'index': op['index'], 'estimated': True})
+                cursor += duration
+        run_event['args'] = {'image': image_path}
+
+    recorder.save(output_path)
+
+    print(f"\nStage timings over {runs} runs (mean / p95 ms):")
+    print("-" * 40)
+    for stage in STAGES:
+        values = np.array(timings[stage])
+        print(f"{stage:>12}: {values.mean():8.3f} / {np.percentile(values, 95):8.3f}")
+
+    invoke_ms = float(np.mean(timings['invoke']))
+    print(f"\nOp timings ({'benchmark_model' if native_ops else 'estimated from FLOPs'}):")
+    print("-" * 40)
+    if native_ops:
+        op_rows = [(op['op'], op['avg_ms']) for op in native_ops]
+    else:
+        op_rows = [(op['op'], invoke_ms * op['cost'] / total_cost) for op in estimated_ops]
+    for name, ms in sorted(op_rows, key=lambda row: row[1], reverse=True)[:10]:
+        print(f"{name:>20}: {ms:8.3f} ms")
+
+    print(f"\nChrome trace saved to {output_path} (open in chrome://tracing or Perfetto)")
+    return timings
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Profile TFLite inference per stage and per op'
+    )
+    parser.add_argument('image_path', help='Image to profile with')
+    parser.add_argument(
+        '--model',
+        default='./models/recyclable_classifier.tflite',
+        help='Path to TFLite model'
+    )
+    parser.add_argument(
+        '--labels',
+        default='./models/class_names.txt',
+        help='Path to class labels file'
+    )
+    parser.add_argument(
+        '--runs',
+        type=int,
+        default=20,
+        help='Profiled inferences'
+    )
+    parser.add_argument(
+        '--num-threads',
+        type=int,
+        default=None,
+        help='Interpreter threads'
+    )
+    parser.add_argument(
+        '--output',
+        default='./models/profile_trace.json',
+        help='Chrome trace JSON output path'
+    )
+    parser.add_argument(
+        '--benchmark-model',
+        default=None,
+        help='Path to the TFLite benchmark_model binary for native op profiling'
+    )
+
+    args = parser.parse_args()
+
+    profile_inference(args.image_path,
+                      model_path=args.model,
+                      labels_path=args.labels,
+                      runs=args.runs,
+                      num_threads=args.num_threads,
+                      output_path=args.output,
+                      benchmark_binary=args.benchmark_model)
+
+if __name__ == "__main__":
+    main()
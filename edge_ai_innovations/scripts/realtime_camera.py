@@ -1,109 +1,444 @@
 import time
-import os
-from infer_tflite import run_inference
-
-try:
-    from picamera import PiCamera
-    CAMERA_TYPE = 'picamera'
-    print("Using Raspberry Pi Camera")
-except ImportError:
-    try:
+import queue
+import threading
+import importlib.util
+import numpy as np
+from infer_tflite import ClassifierSession, InterpreterPool, preprocess_array, startup_report
+
+def detect_camera_backend():
+    # find_spec locates the module without importing it; the chosen backend is
+    # only imported when its source is opened
+    if importlib.util.find_spec('picamera') is not None:
+        return 'picamera'
+    if importlib.util.find_spec('cv2') is not None:
+        return 'opencv'
+    return None
+
+class PiCameraSource:
+    def __init__(self, resolution=(640, 480), size=None):
+        from picamera import PiCamera
+
+        self.camera = PiCamera()
+        self.camera.resolution = resolution
+        self.camera.rotation = 0
+        self.size = size or resolution
+        self.buffer = np.empty((self.size[1], self.size[0], 3), dtype=np.uint8)
+        time.sleep(2)
+
+    def read(self):
+        resize = self.size if self.size != tuple(self.camera.resolution) else None
+        self.camera.capture(self.buffer, format='rgb', resize=resize, use_video_port=True)
+        return self.buffer
+
+    def close(self):
+        self.camera.close()
+
+class OpenCVSource:
+    def __init__(self, device=0, resolution=(640, 480), size=None):
         import cv2
-        CAMERA_TYPE = 'opencv'
+
+        self.cv2 = cv2
+        self.camera = cv2.VideoCapture(device)
+        if isinstance(device, int):
+            self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, resolution[0])
+            self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, resolution[1])
+            time.sleep(2)
+        self.size = size
+
+    def read(self):
+        cv2 = self.cv2
+        ret, frame = self.camera.read()
+        if not ret:
+            return None
+        if self.size is not None:
+            frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    def close(self):
+        self.camera.release()
+
+class SyntheticSource:
+    def __init__(self, resolution=(640, 480), num_frames=None, seed=0):
+        self.resolution = resolution
+        self.num_frames = num_frames
+        self.rng = np.random.default_rng(seed)
+        self.count = 0
+
+    def read(self):
+        if self.num_frames is not None and self.count >= self.num_frames:
+            return None
+        self.count += 1
+        return self.rng.integers(0, 256, (self.resolution[1], self.resolution[0], 3),
+                                 dtype=np.uint8)
+
+    def close(self):
+        pass
+
+def open_source(source='camera', size=None, num_frames=None):
+    if source == 'synthetic':
+        return SyntheticSource(resolution=size or (640, 480), num_frames=num_frames)
+
+    if source != 'camera':
+        if importlib.util.find_spec('cv2') is None:
+            raise RuntimeError("opencv-python is required to read video files")
+        return OpenCVSource(device=source, size=size)
+
+    backend = detect_camera_backend()
+    if backend == 'picamera':
+        print("Using Raspberry Pi Camera")
+        return PiCameraSource(size=size)
+    if backend == 'opencv':
         print("Using OpenCV camera (USB webcam)")
-    except ImportError:
-        print("Error: Neither picamera nor opencv-python is installed")
-        print("Install one of:")
-        print("  - Raspberry Pi: pip3 install picamera")
-        print("  - USB Camera: pip3 install opencv-python")
-        exit(1)
+        return OpenCVSource(device=0, size=size)
+
+    print("Error: Neither picamera nor opencv-python is installed")
+    print("Install one of:")
+    print("  - Raspberry Pi: pip3 install picamera")
+    print("  - USB Camera: pip3 install opencv-python")
+    raise RuntimeError("No camera backend available")
+
+class MotionGate:
+    def __init__(self, threshold=8.0, thumbnail_size=32, max_skip=None):
+        self.threshold = threshold
+        self.thumbnail_size = thumbnail_size
+        self.max_skip = max_skip
+        self.reference = None
+        self.consecutive_skips = 0
+        self.invoked = 0
+        self.skipped = 0
+        self.last_diff = 0.0
+
+    def thumbnail(self, frame):
+        step_y = max(1, frame.shape[0] // self.thumbnail_size)
+        step_x = max(1, frame.shape[1] // self.thumbnail_size)
+        small = frame[::step_y, ::step_x]
+        if small.ndim == 3:
+            small = small @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+        return small.astype(np.float32)
+
+    def should_classify(self, thumb):
+        if self.reference is not None and self.reference.shape == thumb.shape:
+            self.last_diff = float(np.mean(np.abs(thumb - self.reference)))
+            force = self.max_skip is not None and self.consecutive_skips >= self.max_skip
+            if self.last_diff < self.threshold and not force:
+                self.consecutive_skips += 1
+                self.skipped += 1
+                return False
+        return True
+
+    def commit(self, thumb):
+        # Only called once a prediction for this thumbnail exists, so gated
+        # frames never reuse a result from an older scene
+        self.reference = thumb
+        self.consecutive_skips = 0
+        self.invoked += 1
+
+    def stats(self):
+        total = self.invoked + self.skipped
+        return {
+            'invoked': self.invoked,
+            'skipped': self.skipped,
+            'skip_rate': self.skipped / total if total else 0.0,
+        }
+
+class DropOldestQueue:
+    def __init__(self, maxsize=2):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def put(self, item):
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        return self.queue.get(timeout=timeout)
+
+    def qsize(self):
+        return self.queue.qsize()
 
 class RealTimeClassifier:
     def __init__(self, model_path='../models/recyclable_classifier.tflite',
                  labels_path='../models/class_names.txt',
-                 interval=2):
+                 interval=2, source='camera', max_frames=None,
+                 target_fps=None, max_latency_ms=None,
+                 pipelined=False, queue_size=2, report_every=5.0,
+                 pool_size=1, num_threads=None, motion_threshold=None,
+                 motion_max_skip=None, report_startup=False):
         self.model_path = model_path
         self.labels_path = labels_path
         self.interval = interval
+        if target_fps is None:
+            target_fps = 1.0 / interval if interval else 0
+        self.target_fps = target_fps
+        self.max_latency_ms = max_latency_ms
+        self.source = source
+        self.max_frames = max_frames
+        self.pipelined = pipelined
+        self.queue_size = queue_size
+        self.report_every = report_every
+        self.pool_size = pool_size
+        self.num_threads = num_threads
+        self.gate = None
+        if motion_threshold is not None:
+            self.gate = MotionGate(threshold=motion_threshold, max_skip=motion_max_skip)
+        self.report_startup = report_startup
+        self.frame_count = 0
         self.camera = None
+        self.session = None
 
-    def setup_picamera(self):
-        self.camera = PiCamera()
-        self.camera.resolution = (640, 480)
-        self.camera.rotation = 0
-        time.sleep(2)
-
-    def setup_opencv_camera(self):
-        self.camera = cv2.VideoCapture(0)
-        self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        time.sleep(2)
-
-    def capture_picamera(self, filename='temp_frame.jpg'):
-        self.camera.capture(filename)
-
-    def capture_opencv(self, filename='temp_frame.jpg'):
-        ret, frame = self.camera.read()
-        if ret:
-            cv2.imwrite(filename, frame)
+    def print_result(self, frame_id, predicted_class, confidence, latency_ms, reused=False):
+        print("\n" + "-" * 50)
+        suffix = " (unchanged, reused)" if reused else ""
+        print(f"[Frame {frame_id}] CLASSIFICATION: {predicted_class.upper()}{suffix}")
+        print(f"CONFIDENCE: {confidence:.2f}%")
+        print(f"LATENCY: {latency_ms:.1f} ms")
+        print("-" * 50)
 
     def run(self):
         print("\n" + "=" * 50)
         print("Real-Time Recyclable Item Classifier")
         print("=" * 50)
         print(f"Model: {self.model_path}")
-        print(f"Interval: {self.interval} seconds")
+        print(f"Source: {self.source}")
+        print(f"Mode: {'pipelined' if self.pipelined else 'serial'}")
+        print(f"Target FPS: {self.target_fps or 'unlimited'}")
+        if self.max_latency_ms:
+            print(f"Max latency: {self.max_latency_ms} ms")
         print("Press Ctrl+C to stop")
         print("=" * 50 + "\n")
 
-        if CAMERA_TYPE == 'picamera':
-            self.setup_picamera()
+        print("Loading model...")
+        if self.pipelined and self.pool_size > 1:
+            self.session = InterpreterPool(self.model_path, self.labels_path,
+                                           size=self.pool_size, num_threads=self.num_threads)
         else:
-            self.setup_opencv_camera()
+            self.session = ClassifierSession(self.model_path, self.labels_path,
+                                             num_threads=self.num_threads)
+        input_size = (int(self.session.input_shape[2]), int(self.session.input_shape[1]))
 
-        frame_count = 0
+        camera_start = time.perf_counter()
+        self.camera = open_source(self.source, size=input_size, num_frames=self.max_frames)
+        if self.report_startup:
+            first = (self.session.sessions[0] if isinstance(self.session, InterpreterPool)
+                     else self.session)
+            print(f"{startup_report(first)}, "
+                  f"camera open {(time.perf_counter() - camera_start) * 1000:.0f} ms")
+
+        self.frame_count = 0
+        start_time = time.perf_counter()
 
         try:
-            while True:
-                frame_count += 1
-                print(f"\n[Frame {frame_count}] Capturing image...")
+            if self.pipelined:
+                self.run_pipelined()
+            else:
+                self.run_serial()
+
+        except KeyboardInterrupt:
+            print("\n\nStopping classifier...")
+
+        finally:
+            self.camera.close()
+            if isinstance(self.session, InterpreterPool):
+                self.session.close()
+
+            elapsed = time.perf_counter() - start_time
+            if self.frame_count and elapsed > 0:
+                print(f"Processed {self.frame_count} frames at "
+                      f"{self.frame_count / elapsed:.2f} FPS")
+            if self.gate is not None:
+                gate_stats = self.gate.stats()
+                print(f"Motion gate: {gate_stats['invoked']} invoked, "
+                      f"{gate_stats['skipped']} skipped "
+                      f"({gate_stats['skip_rate'] * 100:.1f}% idle)")
 
-                if CAMERA_TYPE == 'picamera':
-                    self.capture_picamera()
+            print("Camera released. Goodbye!")
+
+    def run_serial(self):
+        # Counted on self so the summary survives a Ctrl+C mid-loop
+        self.frame_count = 0
+        frame_period = 1.0 / self.target_fps if self.target_fps else 0
+        last_result = None
+
+        while self.max_frames is None or self.frame_count < self.max_frames:
+            frame_start = time.perf_counter()
+            frame = self.camera.read()
+            if frame is None:
+                print("\nFrame source exhausted.")
+                break
+
+            self.frame_count += 1
+            frame_count = self.frame_count
+
+            try:
+                start = time.perf_counter()
+                thumb = self.gate.thumbnail(frame) if self.gate is not None else None
+                if (thumb is not None and last_result is not None
+                        and not self.gate.should_classify(thumb)):
+                    latency_ms = (time.perf_counter() - start) * 1000
+                    self.print_result(frame_count, *last_result, latency_ms, reused=True)
                 else:
-                    self.capture_opencv()
+                    predictions = self.session.predict_frame(frame)
+                    latency_ms = (time.perf_counter() - start) * 1000
+                    last_result = self.session.classify(predictions)
+                    if thumb is not None:
+                        self.gate.commit(thumb)
+                    self.print_result(frame_count, *last_result, latency_ms)
 
-                print("Running inference...")
-                try:
-                    predicted_class, confidence = run_inference(
-                        model_path=self.model_path,
-                        image_path='temp_frame.jpg',
-                        labels_path=self.labels_path
-                    )
+            except Exception as e:
+                print(f"Inference error: {e}")
 
-                    print("\n" + "-" * 50)
-                    print(f"CLASSIFICATION: {predicted_class.upper()}")
-                    print(f"CONFIDENCE: {confidence:.2f}%")
-                    print("-" * 50)
+            remaining = frame_period - (time.perf_counter() - frame_start)
+            if remaining > 0:
+                time.sleep(remaining)
 
-                except Exception as e:
-                    print(f"Inference error: {e}")
+        return self.frame_count
 
-                time.sleep(self.interval)
+    def run_pipelined(self):
+        frame_queue = DropOldestQueue(self.queue_size)
+        input_queue = DropOldestQueue(self.queue_size)
+        result_queue = queue.Queue()
+        stop = threading.Event()
+        capture_done = threading.Event()
+        preprocess_done = threading.Event()
+        inference_done = threading.Event()
+        stats = {'captured': 0, 'inferred': 0, 'stale': 0, 'gated': 0}
+        # Newest classified frame id and its result; inference threads can
+        # finish out of order, so older frames never overwrite newer ones
+        last_result = [None]
+        last_result_id = [0]
+        stats_lock = threading.Lock()
+        num_inference_threads = len(self.session) if isinstance(self.session, InterpreterPool) else 1
+        inference_running = [num_inference_threads]
+        frame_period = 1.0 / self.target_fps if self.target_fps else 0
+        input_shape = self.session.input_shape
 
-        except KeyboardInterrupt:
-            print("\n\nStopping classifier...")
+        def capture_loop():
+            try:
+                while not stop.is_set():
+                    if self.max_frames is not None and stats['captured'] >= self.max_frames:
+                        break
+                    frame_start = time.perf_counter()
+                    frame = self.camera.read()
+                    if frame is None:
+                        break
+                    stats['captured'] += 1
+                    frame_queue.put((stats['captured'], frame_start, frame.copy()))
+                    remaining = frame_period - (time.perf_counter() - frame_start)
+                    if remaining > 0:
+                        time.sleep(remaining)
+            finally:
+                capture_done.set()
 
-        finally:
-            if CAMERA_TYPE == 'picamera':
-                self.camera.close()
-            else:
-                self.camera.release()
+        def preprocess_loop():
+            try:
+                while not stop.is_set():
+                    try:
+                        frame_id, captured_at, frame = frame_queue.get(timeout=0.1)
+                    except queue.Empty:
+                        if capture_done.is_set():
+                            break
+                        continue
+                    thumb = None
+                    if self.gate is not None:
+                        thumb = self.gate.thumbnail(frame)
+                        with stats_lock:
+                            reused = last_result[0]
+                            gated = reused is not None and not self.gate.should_classify(thumb)
+                            if gated:
+                                stats['gated'] += 1
+                        if gated:
+                            latency_ms = (time.perf_counter() - captured_at) * 1000
+                            result_queue.put((frame_id, *reused, latency_ms, True))
+                            continue
+                    # The thumbnail travels with the frame and becomes the gate's
+                    # reference only if this frame is actually classified
+                    input_queue.put((frame_id, captured_at, preprocess_array(frame, input_shape),
+                                     thumb))
+            finally:
+                preprocess_done.set()
 
-            if os.path.exists('temp_frame.jpg'):
-                os.remove('temp_frame.jpg')
+        def inference_loop():
+            try:
+                while not stop.is_set():
+                    try:
+                        frame_id, captured_at, input_data, thumb = input_queue.get(timeout=0.1)
+                    except queue.Empty:
+                        if preprocess_done.is_set():
+                            break
+                        continue
 
-            print("Camera released. Goodbye!")
+                    age_ms = (time.perf_counter() - captured_at) * 1000
+                    if self.max_latency_ms and age_ms > self.max_latency_ms:
+                        with stats_lock:
+                            stats['stale'] += 1
+                        continue
+
+                    predictions = self.session.predict(input_data)
+                    latency_ms = (time.perf_counter() - captured_at) * 1000
+                    predicted_class, confidence = self.session.classify(predictions)
+                    with stats_lock:
+                        stats['inferred'] += 1
+                        if frame_id > last_result_id[0]:
+                            last_result_id[0] = frame_id
+                            last_result[0] = (predicted_class, confidence)
+                            if thumb is not None:
+                                self.gate.commit(thumb)
+                    result_queue.put((frame_id, predicted_class, confidence, latency_ms))
+            finally:
+                with stats_lock:
+                    inference_running[0] -= 1
+                    if inference_running[0] == 0:
+                        inference_done.set()
+
+        threads = [
+            threading.Thread(target=capture_loop, name='capture', daemon=True),
+            threading.Thread(target=preprocess_loop, name='preprocess', daemon=True),
+        ] + [
+            threading.Thread(target=inference_loop, name=f'inference-{i}', daemon=True)
+            for i in range(num_inference_threads)
+        ]
+        for thread in threads:
+            thread.start()
+
+        start_time = time.perf_counter()
+        last_report = start_time
+        last_inferred = 0
+
+        try:
+            while not (inference_done.is_set() and result_queue.empty()):
+                try:
+                    result = result_queue.get(timeout=0.1)
+                    self.print_result(*result)
+                except queue.Empty:
+                    pass
+
+                now = time.perf_counter()
+                if now - last_report >= self.report_every:
+                    inferred = stats['inferred'] + stats['gated']
+                    fps = (inferred - last_inferred) / (now - last_report)
+                    print(f"\n[Stats] {fps:.2f} FPS | "
+                          f"invoked={stats['inferred']} gated={stats['gated']} | "
+                          f"queue depth capture={frame_queue.qsize()} "
+                          f"preprocess={input_queue.qsize()} | "
+                          f"dropped capture={frame_queue.dropped} "
+                          f"preprocess={input_queue.dropped} stale={stats['stale']}")
+                    last_report = now
+                    last_inferred = inferred
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join(timeout=1.0)
+            self.frame_count = stats['inferred'] + stats['gated']
+
+        return self.frame_count
 
 def main():
     import argparse
@@ -121,11 +456,76 @@ def main():
         default='../models/class_names.txt',
         help='Path to class labels file'
     )
+    parser.add_argument(
+        '--fps',
+        type=float,
+        default=None,
+        help='Target frames per second (0 = as fast as possible, default 0.5)'
+    )
     parser.add_argument(
         '--interval',
         type=float,
         default=2.0,
-        help='Seconds between classifications'
+        help='Seconds between classifications (ignored when --fps is set)'
+    )
+    parser.add_argument(
+        '--max-latency',
+        type=float,
+        default=None,
+        help='Drop frames older than this many milliseconds before inference'
+    )
+    parser.add_argument(
+        '--pipeline',
+        action='store_true',
+        help='Run capture, preprocessing and inference on separate threads'
+    )
+    parser.add_argument(
+        '--queue-size',
+        type=int,
+        default=2,
+        help='Bounded queue size between pipeline stages'
+    )
+    parser.add_argument(
+        '--pool-size',
+        type=int,
+        default=1,
+        help='Interpreters running inference concurrently (pipelined mode only)'
+    )
+    parser.add_argument(
+        '--num-threads',
+        type=int,
+        default=None,
+        help='Threads per interpreter'
+    )
+    parser.add_argument(
+        '--motion-threshold',
+        type=float,
+        default=None,
+        help='Only classify frames whose mean grayscale difference from the last '
+             'classified frame exceeds this (0-255); reuse the previous result otherwise'
+    )
+    parser.add_argument(
+        '--motion-max-skip',
+        type=int,
+        default=None,
+        help='Force a classification after this many consecutive gated frames'
+    )
+    parser.add_argument(
+        '--source',
+        default='camera',
+        help="Frame source: 'camera', 'synthetic', or a path to a video file"
+    )
+    parser.add_argument(
+        '--frames',
+        type=int,
+        default=None,
+        help='Stop after this many frames'
+    )
+
+    parser.add_argument(
+        '--startup-report',
+        action='store_true',
+        help='Print import, model load and camera open times'
     )
 
     args = parser.parse_args()
@@ -133,7 +533,18 @@ def main():
     classifier = RealTimeClassifier(
         model_path=args.model,
         labels_path=args.labels,
-        interval=args.interval
+        interval=args.interval,
+        source=args.source,
+        max_frames=args.frames,
+        target_fps=args.fps,
+        max_latency_ms=args.max_latency,
+        pipelined=args.pipeline,
+        queue_size=args.queue_size,
+        pool_size=args.pool_size,
+        num_threads=args.num_threads,
+        motion_threshold=args.motion_threshold,
+        motion_max_skip=args.motion_max_skip,
+        report_startup=args.startup_report
     )
 
     classifier.run()
@@ -3,10 +3,27 @@ from tensorflow import keras
 from tensorflow.keras import layers
 import numpy as np
 import os
+import csv
+import json
+import time
+import hashlib
 import pathlib
 
-def create_model(num_classes=5, input_shape=(224, 224, 3)):
-    model = keras.Sequential([
+from prediction_cache import fingerprint_file
+from benchmark_tflite import current_rss_mb
+
+ARCHITECTURES = ['baseline', 'gap', 'separable', 'mobilenet_v2', 'mobilenet_v3_small']
+
+# Rough sustained multiply-accumulate rates for TFLite on CPU, used only to
+# estimate latency before a model is benchmarked on the device itself
+DEVICE_GMACS = {
+    'Raspberry Pi Zero': 0.15,
+    'Raspberry Pi 4': 3.0,
+    'Desktop': 40.0,
+}
+
+def _conv_stack(input_shape):
+    return [
         layers.Rescaling(1./255, input_shape=input_shape),
         layers.Conv2D(32, 3, activation='relu'),
         layers.MaxPooling2D(),
@@ -14,63 +31,490 @@ def create_model(num_classes=5, input_shape=(224, 224, 3)):
         layers.MaxPooling2D(),
         layers.Conv2D(64, 3, activation='relu'),
         layers.MaxPooling2D(),
-        layers.Flatten(),
-        layers.Dense(128, activation='relu'),
-        layers.Dropout(0.5),
-        layers.Dense(num_classes, activation='softmax')
-    ])
+    ]
+
+def _separable_stack(input_shape, alpha=1.0):
+    def filters(n):
+        return max(8, int(n * alpha))
+
+    stack = [
+        layers.Rescaling(1./255, input_shape=input_shape),
+        layers.Conv2D(filters(32), 3, strides=2, padding='same', use_bias=False),
+        layers.BatchNormalization(),
+        layers.ReLU(6.),
+    ]
+    for n, stride in [(64, 1), (128, 2), (128, 1), (256, 2), (256, 1), (512, 2)]:
+        stack += [
+            layers.DepthwiseConv2D(3, strides=stride, padding='same', use_bias=False),
+            layers.BatchNormalization(),
+            layers.ReLU(6.),
+            layers.Conv2D(filters(n), 1, use_bias=False),
+            layers.BatchNormalization(),
+            layers.ReLU(6.),
+        ]
+    return stack
+
+def create_model(num_classes=5, input_shape=(224, 224, 3), architecture='baseline',
+                 alpha=1.0, weights=None):
+    if architecture == 'baseline':
+        model = keras.Sequential(_conv_stack(input_shape) + [
+            layers.Flatten(),
+            layers.Dense(128, activation='relu'),
+            layers.Dropout(0.5),
+            layers.Dense(num_classes, activation='softmax', dtype='float32')
+        ])
+    elif architecture == 'gap':
+        model = keras.Sequential(_conv_stack(input_shape) + [
+            layers.GlobalAveragePooling2D(),
+            layers.Dropout(0.2),
+            layers.Dense(num_classes, activation='softmax', dtype='float32')
+        ])
+    elif architecture == 'separable':
+        model = keras.Sequential(_separable_stack(input_shape, alpha) + [
+            layers.GlobalAveragePooling2D(),
+            layers.Dropout(0.2),
+            layers.Dense(num_classes, activation='softmax', dtype='float32')
+        ])
+    elif architecture in ('mobilenet_v2', 'mobilenet_v3_small'):
+        inputs = keras.Input(shape=input_shape)
+        if architecture == 'mobilenet_v2':
+            backbone = keras.applications.MobileNetV2(
+                input_shape=input_shape, alpha=alpha, include_top=False, weights=weights
+            )
+            x = layers.Rescaling(1./127.5, offset=-1)(inputs)
+        else:
+            backbone = keras.applications.MobileNetV3Small(
+                input_shape=input_shape, alpha=alpha, include_top=False, weights=weights,
+                minimalistic=True, include_preprocessing=True
+            )
+            x = inputs
+        x = backbone(x)
+        x = layers.GlobalAveragePooling2D()(x)
+        x = layers.Dropout(0.2)(x)
+        outputs = layers.Dense(num_classes, activation='softmax', dtype='float32')(x)
+        model = keras.Model(inputs, outputs, name=architecture)
+    else:
+        raise ValueError(f"Unknown architecture '{architecture}', choose from {ARCHITECTURES}")
 
     return model
 
-def load_dataset(data_dir='./data', img_height=224, img_width=224, batch_size=32):
-    data_dir = pathlib.Path(data_dir)
+def _shape(tensor):
+    return tuple(int(dim) if dim is not None else 1 for dim in tensor.shape[1:])
 
-    train_ds = tf.keras.utils.image_dataset_from_directory(
-        data_dir / 'train',
-        seed=123,
-        image_size=(img_height, img_width),
-        batch_size=batch_size,
-        validation_split=0.2,
-        subset='training'
-    )
+def count_macs(model):
+    macs = 0
+    for layer in model.layers:
+        if isinstance(layer, keras.Model):
+            macs += count_macs(layer)
+            continue
 
-    val_ds = tf.keras.utils.image_dataset_from_directory(
-        data_dir / 'train',
-        seed=123,
-        image_size=(img_height, img_width),
-        batch_size=batch_size,
-        validation_split=0.2,
-        subset='validation'
-    )
+        try:
+            in_shape = _shape(layer.input)
+            out_shape = _shape(layer.output)
+        except (AttributeError, ValueError):
+            continue
+
+        if isinstance(layer, layers.DepthwiseConv2D):
+            kh, kw = layer.kernel_size
+            macs += out_shape[0] * out_shape[1] * out_shape[2] * kh * kw
+        elif isinstance(layer, layers.SeparableConv2D):
+            kh, kw = layer.kernel_size
+            macs += out_shape[0] * out_shape[1] * in_shape[2] * kh * kw
+            macs += out_shape[0] * out_shape[1] * in_shape[2] * out_shape[2]
+        elif isinstance(layer, layers.Conv2D):
+            kh, kw = layer.kernel_size
+            macs += out_shape[0] * out_shape[1] * out_shape[2] * kh * kw * in_shape[2] // layer.groups
+        elif isinstance(layer, layers.Dense):
+            macs += in_shape[-1] * out_shape[-1]
+
+    return macs
+
+def architecture_report(num_classes=5, img_size=224, architectures=None, alpha=1.0):
+    architectures = architectures or ARCHITECTURES
+    input_shape = (img_size, img_size, 3)
+    devices = list(DEVICE_GMACS)
+
+    print(f"Architectures at {img_size}x{img_size}, width multiplier {alpha}:")
+    header = f"{'architecture':<20} {'params':>10} {'MMACs':>10}"
+    header += "".join(f" {device + ' ms':>22}" for device in devices)
+    print(header)
+    print("-" * len(header))
+
+    report = []
+    for architecture in architectures:
+        model = create_model(num_classes, input_shape, architecture, alpha)
+        macs = count_macs(model)
+        row = {
+            'architecture': architecture,
+            'params': model.count_params(),
+            'macs': macs,
+            'estimated_latency_ms': {device: macs / (gmacs * 1e9) * 1000
+                                     for device, gmacs in DEVICE_GMACS.items()},
+        }
+        report.append(row)
+
+        line = f"{architecture:<20} {row['params']:>10,} {macs / 1e6:>10.1f}"
+        line += "".join(f" {row['estimated_latency_ms'][device]:>22.1f}" for device in devices)
+        print(line)
+        keras.backend.clear_session()
+
+    return report
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif')
+
+def _list_images(train_dir):
+    class_names = sorted(entry.name for entry in os.scandir(train_dir) if entry.is_dir())
+    files, labels = [], []
+    for label, class_name in enumerate(class_names):
+        for entry in sorted(os.scandir(train_dir / class_name), key=lambda e: e.name):
+            if entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                files.append(entry.path)
+                labels.append(label)
+    return class_names, files, labels
+
+def is_validation_file(rel_path, validation_split=0.2, seed=123):
+    # Decided per file from its path, so adding images never moves an
+    # existing image between the training and validation splits
+    digest = hashlib.md5(f"{seed}:{pathlib.PurePath(rel_path).as_posix()}".encode()).hexdigest()
+    return int(digest[:8], 16) / 2 ** 32 < validation_split
+
+def split_images(data_dir='./data', validation_split=0.2, seed=123):
+    train_dir = pathlib.Path(data_dir) / 'train'
+    class_names, files, labels = _list_images(train_dir)
 
+    order = np.random.default_rng(seed).permutation(len(files))
+    splits = {'train': ([], []), 'val': ([], [])}
+    for i in order:
+        held_out = is_validation_file(os.path.relpath(files[i], train_dir), validation_split, seed)
+        split = splits['val' if held_out else 'train']
+        split[0].append(files[i])
+        split[1].append(labels[i])
+    return class_names, splits
+
+def write_tfrecords(data_dir='./data', output_dir='./data/tfrecords', img_size=224,
+                    num_shards=8, validation_split=0.2, seed=123, encoding='jpeg'):
+    class_names, splits = split_images(data_dir, validation_split, seed)
+
+    def encode(path, label):
+        image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+        image = tf.cast(tf.image.resize(image, (img_size, img_size)), tf.uint8)
+        if encoding == 'jpeg':
+            data = tf.io.encode_jpeg(image, quality=95)
+        else:
+            data = tf.io.serialize_tensor(image)
+        return data, label
+
+    os.makedirs(output_dir, exist_ok=True)
+    for split, (split_files, split_labels) in splits.items():
+        shards = max(1, min(num_shards, len(split_files)))
+        for shard in range(shards):
+            shard_path = os.path.join(output_dir, f'{split}-{shard:05d}-of-{shards:05d}.tfrecord')
+            ds = tf.data.Dataset.from_tensor_slices(
+                (split_files[shard::shards], split_labels[shard::shards])
+            ).map(encode, num_parallel_calls=tf.data.AUTOTUNE)
+
+            with tf.io.TFRecordWriter(shard_path) as writer:
+                for data, label in ds.as_numpy_iterator():
+                    example = tf.train.Example(features=tf.train.Features(feature={
+                        'image': tf.train.Feature(bytes_list=tf.train.BytesList(value=[data])),
+                        'label': tf.train.Feature(int64_list=tf.train.Int64List(value=[label])),
+                    }))
+                    writer.write(example.SerializeToString())
+
+        print(f"Wrote {len(split_files)} {split} images to {shards} shards in {output_dir}")
+
+    with open(os.path.join(output_dir, 'metadata.json'), 'w') as f:
+        json.dump({'class_names': class_names, 'img_size': img_size, 'encoding': encoding,
+                   'num_train': len(splits['train'][0]), 'num_val': len(splits['val'][0])},
+                  f, indent=2)
+
+    return class_names
+
+def _to_float(images, labels):
+    return tf.cast(images, tf.float32), labels
+
+def load_tfrecord_dataset(tfrecord_dir, split='train', batch_size=32, deterministic=True,
+                          cache_dir=None, shuffle_buffer=1000, seed=123, image_size=None):
+    with open(os.path.join(tfrecord_dir, 'metadata.json')) as f:
+        metadata = json.load(f)
+    img_size = metadata['img_size']
+    target_size = tuple(image_size) if image_size is not None else (img_size, img_size)
+    AUTOTUNE = tf.data.AUTOTUNE
+
+    features = {
+        'image': tf.io.FixedLenFeature([], tf.string),
+        'label': tf.io.FixedLenFeature([], tf.int64),
+    }
+
+    def parse(record):
+        example = tf.io.parse_single_example(record, features)
+        if metadata['encoding'] == 'jpeg':
+            image = tf.io.decode_jpeg(example['image'], channels=3)
+        else:
+            image = tf.io.parse_tensor(example['image'], tf.uint8)
+        image = tf.reshape(image, (img_size, img_size, 3))
+        if target_size != (img_size, img_size):
+            image = tf.cast(tf.round(tf.image.resize(image, target_size)), tf.uint8)
+        return image, tf.cast(example['label'], tf.int32)
+
+    files = tf.data.Dataset.list_files(os.path.join(tfrecord_dir, f'{split}-*.tfrecord'),
+                                       shuffle=split == 'train', seed=seed)
+    ds = files.interleave(tf.data.TFRecordDataset, cycle_length=AUTOTUNE,
+                          num_parallel_calls=AUTOTUNE, deterministic=deterministic)
+    ds = ds.map(parse, num_parallel_calls=AUTOTUNE, deterministic=deterministic)
+
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        ds = ds.cache(os.path.join(
+            cache_dir, f'tfrecord-{split}-{target_size[0]}x{target_size[1]}-uint8'))
+    if split == 'train':
+        ds = ds.shuffle(shuffle_buffer, seed=seed)
+    ds = ds.batch(batch_size).map(_to_float, num_parallel_calls=AUTOTUNE,
+                                  deterministic=deterministic)
+    ds = ds.prefetch(AUTOTUNE)
+
+    return ds, metadata['class_names']
+
+def load_dataset(data_dir='./data', img_height=224, img_width=224, batch_size=32, cache=True,
+                 tfrecord_dir=None, cache_dir=None, deterministic=True):
+    if tfrecord_dir:
+        image_size = (img_height, img_width)
+        train_ds, class_names = load_tfrecord_dataset(tfrecord_dir, 'train', batch_size,
+                                                      deterministic, cache_dir,
+                                                      image_size=image_size)
+        val_ds, _ = load_tfrecord_dataset(tfrecord_dir, 'val', batch_size,
+                                          deterministic, cache_dir, image_size=image_size)
+        return train_ds, val_ds, class_names
+
+    class_names, splits = split_images(data_dir)
     AUTOTUNE = tf.data.AUTOTUNE
-    train_ds = train_ds.cache().prefetch(buffer_size=AUTOTUNE)
-    val_ds = val_ds.cache().prefetch(buffer_size=AUTOTUNE)
 
-    return train_ds, val_ds, train_ds.class_names
+    def load(path, label):
+        image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+        image = tf.image.resize(image, (img_height, img_width))
+        image.set_shape((img_height, img_width, 3))
+        return tf.cast(tf.round(image), tf.uint8), label
+
+    def build(split, shuffle_buffer=1000, seed=123):
+        files, labels = splits[split]
+        ds = tf.data.Dataset.from_tensor_slices((files, np.asarray(labels, dtype=np.int32)))
+        ds = ds.map(load, num_parallel_calls=AUTOTUNE, deterministic=deterministic)
+        # Cache decoded uint8 pixels, a quarter of the size of the float32 batches
+        if cache_dir:
+            ds = ds.cache(os.path.join(cache_dir, f'{split}-{img_height}x{img_width}-uint8'))
+        elif cache:
+            ds = ds.cache()
+        if split == 'train':
+            ds = ds.shuffle(shuffle_buffer, seed=seed)
+        ds = ds.batch(batch_size).map(_to_float, num_parallel_calls=AUTOTUNE,
+                                      deterministic=deterministic)
+        return ds.prefetch(AUTOTUNE)
+
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+    print(f"Found {len(splits['train'][0])} training and {len(splits['val'][0])} "
+          f"validation images in {len(class_names)} classes")
+    return build('train'), build('val'), class_names
+
+class ThroughputCallback(keras.callbacks.Callback):
+    def __init__(self, batch_size):
+        super().__init__()
+        self.batch_size = batch_size
+        self.epoch_images_per_sec = []
+        self.epoch_step_time_ms = []
 
-def train_model(epochs=10, save_path='./models/recyclable_classifier.h5'):
+    def on_epoch_begin(self, epoch, logs=None):
+        self.steps = 0
+        self.epoch_start = time.perf_counter()
+        self.train_end = self.epoch_start
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.steps += 1
+        self.train_end = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        # Measured up to the last training step so validation is excluded
+        elapsed = self.train_end - self.epoch_start
+        images_per_sec = self.steps * self.batch_size / elapsed if elapsed > 0 else 0.0
+        step_time_ms = elapsed / self.steps * 1000 if self.steps else 0.0
+        self.epoch_images_per_sec.append(images_per_sec)
+        self.epoch_step_time_ms.append(step_time_ms)
+        if logs is not None:
+            logs['images_per_sec'] = images_per_sec
+            logs['step_time_ms'] = step_time_ms
+        print(f"Epoch {epoch + 1}: {step_time_ms:.1f} ms/step, {images_per_sec:.1f} images/sec")
+
+class TrainingTelemetry(ThroughputCallback):
+    def __init__(self, batch_size, output_path='./models/training_telemetry',
+                 memory_sample_every=10):
+        super().__init__(batch_size)
+        self.output_path = output_path
+        self.memory_sample_every = memory_sample_every
+        self.records = []
+        self.delivered = None
+
+    def instrument(self, dataset):
+        # Runs inline in the consumer's get_next(), after any prefetch buffer,
+        # so the stamp marks when the training step actually received its batch
+        def mark_delivery():
+            self.delivered = time.perf_counter()
+            return np.float32(0)
+
+        def stamp(*batch):
+            marker = tf.py_function(mark_delivery, [], tf.float32)
+            with tf.control_dependencies([marker]):
+                return tf.nest.map_structure(tf.identity, batch)
+
+        # tf.data's inject_prefetch would otherwise add a background prefetch
+        # after this final map, stamping when a batch was produced rather than
+        # when the step received it
+        options = tf.data.Options()
+        try:
+            options.experimental_optimization.inject_prefetch = False
+        except AttributeError:
+            pass
+        return dataset.map(stamp).with_options(options)
+
+    def on_epoch_begin(self, epoch, logs=None):
+        super().on_epoch_begin(epoch, logs)
+        self.input_wait = 0.0
+        self.compute = 0.0
+        self.cpu_start = time.process_time()
+        self.cpu_end = self.cpu_start
+        # Current RSS sampled through the epoch; ru_maxrss is a process-lifetime
+        # high-water mark and could never show an epoch using less memory
+        self.peak_rss = current_rss_mb()
+
+    def on_train_batch_begin(self, batch, logs=None):
+        self.batch_start = time.perf_counter()
+        self.delivered = None
+
+    def on_train_batch_end(self, batch, logs=None):
+        super().on_train_batch_end(batch, logs)
+        if self.delivered is not None and self.delivered >= self.batch_start:
+            self.input_wait += self.delivered - self.batch_start
+            self.compute += self.train_end - self.delivered
+        else:
+            self.compute += self.train_end - self.batch_start
+
+        # Snapshotted with train_end so validation CPU time is excluded too
+        self.cpu_end = time.process_time()
+        if self.steps % self.memory_sample_every == 0:
+            self.peak_rss = max(self.peak_rss, current_rss_mb())
+
+    def on_epoch_end(self, epoch, logs=None):
+        super().on_epoch_end(epoch, logs)
+        wall = self.train_end - self.epoch_start
+        cpu = self.cpu_end - self.cpu_start
+        cpu_count = os.cpu_count() or 1
+
+        record = {
+            'epoch': epoch + 1,
+            'steps': self.steps,
+            'wall_sec': wall,
+            'step_time_ms': self.epoch_step_time_ms[-1],
+            'images_per_sec': self.epoch_images_per_sec[-1],
+            'input_wait_sec': self.input_wait,
+            'compute_sec': self.compute,
+            'input_wait_fraction': self.input_wait / wall if wall > 0 else 0.0,
+            'peak_rss_mb': max(self.peak_rss, current_rss_mb()),
+            'cpu_percent': 100 * cpu / wall if wall > 0 else 0.0,
+            'cpu_utilization': cpu / (wall * cpu_count) if wall > 0 else 0.0,
+        }
+        for key, value in (logs or {}).items():
+            if key not in record and isinstance(value, (int, float, np.floating)):
+                record[key] = float(value)
+        self.records.append(record)
+        self.save()
+
+        print(f"Epoch {epoch + 1}: input wait {record['input_wait_fraction'] * 100:.1f}%, "
+              f"peak RSS {record['peak_rss_mb']:.0f} MB, CPU {record['cpu_percent']:.0f}%")
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.output_path) or '.', exist_ok=True)
+
+        with open(self.output_path + '.json', 'w') as f:
+            json.dump({'batch_size': self.batch_size, 'cpu_count': os.cpu_count(),
+                       'epochs': self.records}, f, indent=2)
+
+        fields = list(dict.fromkeys(key for record in self.records for key in record))
+        with open(self.output_path + '.csv', 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(self.records)
+
+def cpu_supports_bfloat16():
+    try:
+        with open('/proc/cpuinfo') as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return 'avx512_bf16' in flags or 'amx_bf16' in flags
+
+def resolve_precision_policy(mixed_precision):
+    if mixed_precision in (None, 'off', 'float32'):
+        return 'float32'
+    if mixed_precision == 'bfloat16':
+        return 'mixed_bfloat16'
+    if mixed_precision == 'float16':
+        return 'mixed_float16'
+    if mixed_precision == 'auto':
+        if tf.config.list_physical_devices('GPU'):
+            return 'mixed_float16'
+        if cpu_supports_bfloat16():
+            return 'mixed_bfloat16'
+        print("No bfloat16 support detected on this CPU, training in float32")
+        return 'float32'
+    raise ValueError(f"Unknown mixed precision mode '{mixed_precision}'")
+
+def train_model(epochs=10, save_path='./models/recyclable_classifier.h5',
+                architecture='baseline', alpha=1.0, img_size=224, weights=None,
+                data_dir='./data', batch_size=32, tfrecord_dir=None, cache_dir=None,
+                deterministic=True, mixed_precision=None, jit_compile=False):
     print("Loading dataset...")
-    train_ds, val_ds, class_names = load_dataset()
+    train_ds, val_ds, class_names = load_dataset(data_dir, img_height=img_size, img_width=img_size,
+                                                 batch_size=batch_size,
+                                                 cache=cache_dir is None and tfrecord_dir is None,
+                                                 tfrecord_dir=tfrecord_dir, cache_dir=cache_dir,
+                                                 deterministic=deterministic)
 
     print(f"Classes: {class_names}")
 
-    print("Creating model...")
-    model = create_model(num_classes=len(class_names))
+    policy = resolve_precision_policy(mixed_precision)
+    keras.mixed_precision.set_global_policy(policy)
+
+    print(f"Creating {architecture} model (precision policy {policy}, XLA {jit_compile})...")
+    model_args = dict(num_classes=len(class_names), input_shape=(img_size, img_size, 3),
+                      architecture=architecture, alpha=alpha, weights=weights)
+    model = create_model(**model_args)
 
     model.compile(
         optimizer='adam',
         loss='sparse_categorical_crossentropy',
-        metrics=['accuracy']
+        metrics=['accuracy'],
+        jit_compile=jit_compile
     )
 
+    telemetry = TrainingTelemetry(batch_size, os.path.splitext(save_path)[0] + '_telemetry')
+    train_ds = telemetry.instrument(train_ds)
+
     print("Training model...")
     history = model.fit(
         train_ds,
         validation_data=val_ds,
-        epochs=epochs
+        epochs=epochs,
+        callbacks=[telemetry]
     )
 
+    if policy != 'float32':
+        # Export a plain float32 copy so TFLite conversion sees float32 weights
+        keras.mixed_precision.set_global_policy('float32')
+        trained_weights = model.get_weights()
+        model = create_model(**{**model_args, 'weights': None})
+        model.set_weights(trained_weights)
+        model.compile(optimizer='adam', loss='sparse_categorical_crossentropy',
+                      metrics=['accuracy'])
+
     os.makedirs(os.path.dirname(save_path), exist_ok=True)
     model.save(save_path)
     print(f"Model saved to {save_path}")
@@ -79,8 +523,493 @@ def train_model(epochs=10, save_path='./models/recyclable_classifier.h5'):
         for class_name in class_names:
             f.write(f"{class_name}\n")
 
+    update_manifest(data_dir, save_path)
+
     return model, history
 
-if __name__ == "__main__":
-    model, history = train_model(epochs=10)
+def _files_dataset(files, labels, img_size, batch_size, targets=None, shuffle=False, seed=123):
+    def load(path):
+        image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+        image = tf.image.resize(image, (img_size, img_size))
+        image.set_shape((img_size, img_size, 3))
+        return image
+
+    labels = np.asarray(labels, dtype=np.float32)
+    if targets is None:
+        ds = tf.data.Dataset.from_tensor_slices((files, labels.astype(np.int32)))
+    else:
+        # Pack the hard label in front of the teacher log-probabilities so the
+        # standard fit() loop can carry both to the distillation loss
+        packed = np.concatenate([labels[:, None], targets], axis=1).astype(np.float32)
+        ds = tf.data.Dataset.from_tensor_slices((files, packed))
+
+    if shuffle:
+        ds = ds.shuffle(len(files), seed=seed, reshuffle_each_iteration=True)
+    ds = ds.map(lambda path, y: (load(path), y), num_parallel_calls=tf.data.AUTOTUNE)
+    return ds.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+def distillation_loss(temperature=4.0, alpha=0.3):
+    def loss(y_true, y_pred):
+        labels = tf.cast(y_true[:, 0], tf.int32)
+        teacher_log_probs = y_true[:, 1:]
+        hard = keras.losses.sparse_categorical_crossentropy(labels, y_pred)
+
+        student_log_probs = tf.math.log(tf.clip_by_value(y_pred, 1e-7, 1.0))
+        teacher_soft = tf.nn.softmax(teacher_log_probs / temperature)
+        student_soft = tf.nn.log_softmax(student_log_probs / temperature)
+        soft = -tf.reduce_sum(teacher_soft * student_soft, axis=-1) * temperature ** 2
+
+        return alpha * hard + (1 - alpha) * soft
+    return loss
+
+def distillation_accuracy(y_true, y_pred):
+    return keras.metrics.sparse_categorical_accuracy(y_true[:, :1], y_pred)
+
+def cache_teacher_logits(teacher, splits, img_size, batch_size, cache_path):
+    if os.path.exists(cache_path):
+        print(f"Using cached teacher logits from {cache_path}")
+        cached = np.load(cache_path)
+        return {split: cached[split] for split in splits}
+
+    logits = {}
+    for split, (files, labels) in splits.items():
+        print(f"Computing teacher logits for {len(files)} {split} images...")
+        ds = _files_dataset(files, labels, img_size, batch_size)
+        probs = teacher.predict(ds.map(lambda image, label: image), verbose=0)
+        logits[split] = np.log(np.clip(probs, 1e-7, 1.0)).astype(np.float32)
+
+    os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+    np.savez(cache_path, **logits)
+    print(f"Teacher logits cached to {cache_path}")
+    return logits
+
+def distill_model(teacher_path='./models/teacher.h5', teacher_architecture='mobilenet_v2',
+                  student_architecture='gap', student_alpha=1.0, img_size=224,
+                  data_dir='./data', batch_size=32, teacher_weights='imagenet',
+                  teacher_epochs=10, epochs=10,
+                  temperature=4.0, alpha=0.3, cache_dir='./models/distill_cache',
+                  save_path='./models/recyclable_classifier.h5',
+                  tflite_path='./models/recyclable_classifier.tflite'):
+    from convert_tflite import convert_to_tflite
+
+    class_names, splits = split_images(data_dir)
+    print(f"Classes: {class_names}")
+
+    if os.path.exists(teacher_path):
+        print(f"Loading teacher from {teacher_path}...")
+        teacher = keras.models.load_model(teacher_path)
+    else:
+        print(f"Training {teacher_architecture} teacher...")
+        teacher = create_model(len(class_names), (img_size, img_size, 3), teacher_architecture,
+                               weights=teacher_weights)
+        teacher.compile(optimizer='adam', loss='sparse_categorical_crossentropy',
+                        metrics=['accuracy'])
+        teacher.fit(_files_dataset(*splits['train'], img_size, batch_size, shuffle=True),
+                    validation_data=_files_dataset(*splits['val'], img_size, batch_size),
+                    epochs=teacher_epochs)
+        os.makedirs(os.path.dirname(teacher_path) or '.', exist_ok=True)
+        teacher.save(teacher_path)
+
+    teacher_size = teacher.input_shape[1]
+    stat = os.stat(teacher_path)
+    fingerprint = hashlib.blake2b(
+        json.dumps([splits, teacher_size, stat.st_size, stat.st_mtime]).encode(),
+        digest_size=8
+    ).hexdigest()
+    logits = cache_teacher_logits(teacher, splits, teacher_size, batch_size,
+                                  os.path.join(cache_dir, f'teacher_logits_{fingerprint}.npz'))
+    del teacher
+    keras.backend.clear_session()
+
+    print(f"Distilling into {student_architecture} student...")
+    model_args = dict(num_classes=len(class_names), input_shape=(img_size, img_size, 3),
+                      architecture=student_architecture, alpha=student_alpha)
+    student = create_model(**model_args)
+    student.compile(optimizer='adam', loss=distillation_loss(temperature, alpha),
+                    metrics=[distillation_accuracy])
+
+    telemetry = TrainingTelemetry(batch_size, os.path.splitext(save_path)[0] + '_telemetry')
+    history = student.fit(
+        telemetry.instrument(_files_dataset(*splits['train'], img_size, batch_size,
+                                            targets=logits['train'], shuffle=True)),
+        validation_data=_files_dataset(*splits['val'], img_size, batch_size,
+                                       targets=logits['val']),
+        epochs=epochs,
+        callbacks=[telemetry]
+    )
+
+    # Recompile with the stock loss so the saved model loads without custom objects
+    student.compile(optimizer='adam', loss='sparse_categorical_crossentropy',
+                    metrics=['accuracy'])
+    os.makedirs(os.path.dirname(save_path), exist_ok=True)
+    student.save(save_path)
+    print(f"Student saved to {save_path}")
+
+    with open('./models/class_names.txt', 'w') as f:
+        for class_name in class_names:
+            f.write(f"{class_name}\n")
+
+    update_manifest(data_dir, save_path)
+
+    convert_to_tflite(model_path=save_path, output_path=tflite_path, model=student)
+
+    return student, history
+
+def manifest_path_for(model_path):
+    # One manifest per model, so fine-tuning diffs against the data that
+    # model was actually trained on
+    return os.path.splitext(model_path)[0] + '_manifest.json'
+
+def build_manifest(data_dir='./data', previous=None):
+    previous = previous or {}
+    train_dir = pathlib.Path(data_dir) / 'train'
+    class_names, files, _ = _list_images(train_dir)
+
+    manifest = {}
+    for path in files:
+        rel = os.path.relpath(path, train_dir)
+        stat = os.stat(path)
+        entry = previous.get(rel)
+        # Only re-hash files whose size or mtime moved since the last manifest
+        if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+            manifest[rel] = entry
+        else:
+            manifest[rel] = {'size': stat.st_size, 'mtime': stat.st_mtime,
+                             'hash': fingerprint_file(path)}
+    return manifest
+
+def update_manifest(data_dir, model_path):
+    if (pathlib.Path(data_dir) / 'train').is_dir():
+        manifest_path = manifest_path_for(model_path)
+        save_manifest(build_manifest(data_dir, load_manifest(manifest_path)), manifest_path)
+
+def load_manifest(manifest_path):
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path) as f:
+        return json.load(f)
+
+def save_manifest(manifest, manifest_path):
+    os.makedirs(os.path.dirname(manifest_path) or '.', exist_ok=True)
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f)
+
+def _replace_with_backup(tmp_path, path):
+    if os.path.exists(path):
+        backup_path = '{0}_previous{1}'.format(*os.path.splitext(path))
+        os.replace(path, backup_path)
+        print(f"Previous version kept at {backup_path}")
+    os.replace(tmp_path, path)
+
+def finetune_model(model_path='./models/recyclable_classifier.h5', data_dir='./data',
+                   manifest_path=None,
+                   labels_path='./models/class_names.txt', epochs=3, batch_size=32,
+                   learning_rate=1e-4, freeze_features=True, replay_fraction=0.0,
+                   max_accuracy_drop=0.01,
+                   tflite_path='./models/recyclable_classifier.tflite'):
+    from convert_tflite import convert_to_tflite
+
+    train_dir = pathlib.Path(data_dir) / 'train'
+    class_names, splits = split_images(data_dir)
+    with open(labels_path) as f:
+        known_classes = [line.strip() for line in f if line.strip()]
+    if class_names != known_classes:
+        raise ValueError(f"Classes changed from {known_classes} to {class_names}; "
+                         "run a full train_model instead of fine-tuning")
+
+    manifest_path = manifest_path or manifest_path_for(model_path)
+    previous = load_manifest(manifest_path)
+    manifest = build_manifest(data_dir, previous)
+
+    # Held-out images are never trained on, even when they are new
+    files, labels = splits['train']
+    changed = [i for i, path in enumerate(files)
+               if previous.get(os.path.relpath(path, train_dir), {}).get('hash')
+               != manifest[os.path.relpath(path, train_dir)]['hash']]
+
+    if not changed:
+        print("No new or changed training images since the last training run")
+        return None, None
+    print(f"Fine-tuning on {len(changed)} new or changed images")
+
+    selected = list(changed)
+    if replay_fraction > 0:
+        unchanged = sorted(set(range(len(files))) - set(changed))
+        num_replay = min(len(unchanged), int(len(changed) * replay_fraction))
+        if num_replay:
+            rng = np.random.default_rng(123)
+            selected += list(rng.choice(unchanged, num_replay, replace=False))
+            print(f"Replaying {num_replay} previously seen images")
+
+    print(f"Loading model from {model_path}...")
+    model = keras.models.load_model(model_path)
+    img_size = model.input_shape[1]
+
+    if freeze_features:
+        head_start = max((i for i, layer in enumerate(model.layers)
+                          if isinstance(layer, (layers.Flatten, layers.GlobalAveragePooling2D))),
+                         default=len(model.layers) - 2)
+        for layer in model.layers[:head_start + 1]:
+            layer.trainable = False
+        print(f"Training {len(model.layers) - head_start - 1} head layers, "
+              f"{head_start + 1} feature layers frozen")
+
+    model.compile(
+        optimizer=keras.optimizers.Adam(learning_rate),
+        loss='sparse_categorical_crossentropy',
+        metrics=['accuracy']
+    )
+
+    val_dataset = None
+    if splits['val'][0]:
+        val_dataset = _files_dataset(*splits['val'], img_size, batch_size)
+        _, baseline_accuracy = model.evaluate(val_dataset, verbose=0)
+        print(f"Held-out accuracy before fine-tuning: {baseline_accuracy:.4f}")
+    else:
+        print("No held-out images; the fine-tuned model is saved without validation")
+
+    telemetry = TrainingTelemetry(batch_size,
+                                  os.path.splitext(model_path)[0] + '_finetune_telemetry')
+    history = model.fit(
+        telemetry.instrument(_files_dataset([files[i] for i in selected],
+                                            [labels[i] for i in selected],
+                                            img_size, batch_size, shuffle=True)),
+        epochs=epochs,
+        callbacks=[telemetry]
+    )
+
+    if val_dataset is not None:
+        _, accuracy = model.evaluate(val_dataset, verbose=0)
+        print(f"Held-out accuracy after fine-tuning: {accuracy:.4f}")
+        if accuracy < baseline_accuracy - max_accuracy_drop:
+            print(f"Fine-tuning lost {baseline_accuracy - accuracy:.4f} held-out accuracy; "
+                  f"keeping the previous model at {model_path}")
+            return None, history
+
+    for layer in model.layers:
+        layer.trainable = True
+    model.compile(optimizer='adam', loss='sparse_categorical_crossentropy',
+                  metrics=['accuracy'])
+
+    # Write both files next to the originals first so a failed export never
+    # leaves the deployed model half-replaced
+    tmp_model_path = '{0}_finetuned{1}'.format(*os.path.splitext(model_path))
+    tmp_tflite_path = '{0}_finetuned{1}'.format(*os.path.splitext(tflite_path))
+    model.save(tmp_model_path)
+    convert_to_tflite(model_path=tmp_model_path, output_path=tmp_tflite_path, model=model)
+    _replace_with_backup(tmp_model_path, model_path)
+    _replace_with_backup(tmp_tflite_path, tflite_path)
+    print(f"Model saved to {model_path}")
+
+    save_manifest(manifest, manifest_path)
+    return model, history
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Train the recyclable item classifier'
+    )
+    parser.add_argument(
+        '--epochs',
+        type=int,
+        default=10,
+        help='Training epochs'
+    )
+    parser.add_argument(
+        '--architecture',
+        choices=ARCHITECTURES,
+        default='baseline',
+        help='Model architecture'
+    )
+    parser.add_argument(
+        '--alpha',
+        type=float,
+        default=1.0,
+        help='Width multiplier for separable and MobileNet architectures'
+    )
+    parser.add_argument(
+        '--img-size',
+        type=int,
+        default=224,
+        help='Input resolution (square)'
+    )
+    parser.add_argument(
+        '--weights',
+        default=None,
+        help="Backbone weights for MobileNet architectures, e.g. 'imagenet'"
+    )
+    parser.add_argument(
+        '--data-dir',
+        default='./data',
+        help='Dataset root containing train/<class>/ folders'
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=32,
+        help='Training batch size'
+    )
+    parser.add_argument(
+        '--write-tfrecords',
+        action='store_true',
+        help='Pre-shard data-dir into resized TFRecords under --tfrecord-dir before training'
+    )
+    parser.add_argument(
+        '--tfrecord-dir',
+        default=None,
+        help='Train from pre-sharded TFRecords in this directory'
+    )
+    parser.add_argument(
+        '--num-shards',
+        type=int,
+        default=8,
+        help='Shards per split when writing TFRecords'
+    )
+    parser.add_argument(
+        '--cache-dir',
+        default=None,
+        help='Cache decoded images on disk here instead of in memory'
+    )
+    parser.add_argument(
+        '--nondeterministic',
+        action='store_true',
+        help='Allow out-of-order parallel reads for higher input throughput'
+    )
+    parser.add_argument(
+        '--mixed-precision',
+        choices=['off', 'auto', 'bfloat16', 'float16'],
+        default='off',
+        help="Mixed-precision policy; 'auto' picks bfloat16 on CPUs that support it"
+    )
+    parser.add_argument(
+        '--xla',
+        action='store_true',
+        help='Compile the training step with XLA (jit_compile)'
+    )
+    parser.add_argument(
+        '--distill',
+        action='store_true',
+        help='Distill a larger teacher into the selected --architecture and export TFLite'
+    )
+    parser.add_argument(
+        '--teacher',
+        default='./models/teacher.h5',
+        help='Teacher model (.h5); trained first if it does not exist'
+    )
+    parser.add_argument(
+        '--teacher-architecture',
+        choices=ARCHITECTURES,
+        default='mobilenet_v2',
+        help='Architecture used when the teacher has to be trained'
+    )
+    parser.add_argument(
+        '--teacher-weights',
+        default='imagenet',
+        help="Backbone weights for the teacher, or 'none' to train it from scratch"
+    )
+    parser.add_argument(
+        '--teacher-epochs',
+        type=int,
+        default=10,
+        help='Number of epochs when the teacher has to be trained'
+    )
+    parser.add_argument(
+        '--temperature',
+        type=float,
+        default=4.0,
+        help='Distillation softmax temperature'
+    )
+    parser.add_argument(
+        '--distill-alpha',
+        type=float,
+        default=0.3,
+        help='Weight of the hard-label loss versus the teacher soft targets'
+    )
+    parser.add_argument(
+        '--finetune',
+        action='store_true',
+        help='Fine-tune the saved model on new or changed images only and re-export TFLite'
+    )
+    parser.add_argument(
+        '--max-accuracy-drop',
+        type=float,
+        default=0.01,
+        help='Keep the previous model if fine-tuning lowers held-out accuracy by more than this'
+    )
+    parser.add_argument(
+        '--unfreeze',
+        action='store_true',
+        help='Also update the feature layers when fine-tuning'
+    )
+    parser.add_argument(
+        '--replay',
+        type=float,
+        default=0.0,
+        help='Mix in this many previously seen images per new image when fine-tuning'
+    )
+    parser.add_argument(
+        '--learning-rate',
+        type=float,
+        default=1e-4,
+        help='Learning rate for fine-tuning'
+    )
+    parser.add_argument(
+        '--report',
+        action='store_true',
+        help='Print params, MACs and estimated latency per architecture and exit'
+    )
+
+    args = parser.parse_args()
+
+    if args.report:
+        architecture_report(img_size=args.img_size, alpha=args.alpha)
+        return
+
+    if args.finetune:
+        finetune_model(data_dir=args.data_dir,
+                       epochs=args.epochs,
+                       batch_size=args.batch_size,
+                       learning_rate=args.learning_rate,
+                       freeze_features=not args.unfreeze,
+                       replay_fraction=args.replay,
+                       max_accuracy_drop=args.max_accuracy_drop)
+        return
+
+    if args.distill:
+        distill_model(teacher_path=args.teacher,
+                      teacher_architecture=args.teacher_architecture,
+                      student_architecture=args.architecture,
+                      student_alpha=args.alpha,
+                      img_size=args.img_size,
+                      data_dir=args.data_dir,
+                      batch_size=args.batch_size,
+                      teacher_weights=None if args.teacher_weights == 'none' else args.teacher_weights,
+                      teacher_epochs=args.teacher_epochs,
+                      epochs=args.epochs,
+                      temperature=args.temperature,
+                      alpha=args.distill_alpha)
+        print("Distillation completed successfully!")
+        return
+
+    if args.write_tfrecords:
+        args.tfrecord_dir = args.tfrecord_dir or os.path.join(args.data_dir, 'tfrecords')
+        write_tfrecords(args.data_dir, args.tfrecord_dir, img_size=args.img_size,
+                        num_shards=args.num_shards)
+
+    model, history = train_model(epochs=args.epochs,
+                                 architecture=args.architecture,
+                                 alpha=args.alpha,
+                                 img_size=args.img_size,
+                                 weights=args.weights,
+                                 data_dir=args.data_dir,
+                                 batch_size=args.batch_size,
+                                 tfrecord_dir=args.tfrecord_dir,
+                                 cache_dir=args.cache_dir,
+                                 deterministic=not args.nondeterministic,
+                                 mixed_precision=args.mixed_precision,
+                                 jit_compile=args.xla)
     print("Training completed successfully!")
+
+if __name__ == "__main__":
+    main()
@@ -36,9 +36,13 @@ setup(
         "dev": [
             "jupyter>=1.0.0",
             "notebook>=7.0.0",
+            "pytest>=7.0.0",
         ],
         "edge": [
             "tflite-runtime>=2.13.0",
         ],
+        "optimize": [
+            "tensorflow-model-optimization>=0.7.0",
+        ],
     },
 )
@@ -0,0 +1,67 @@
+import asyncio
+
+import numpy as np
+
+from inference_server import Metrics, MicroBatcher, batch_buckets
+
+
+class FakeSession:
+    input_shape = (1, 2, 2, 3)
+
+    def __init__(self):
+        self.batch_size = 1
+        self.calls = []
+
+    def supports_batching(self):
+        return True
+
+    def set_batch_size(self, batch_size):
+        self.batch_size = batch_size
+        return True
+
+    def predict_batch(self, batch):
+        self.calls.append(len(batch))
+        # One score per image: its mean pixel, so padding is easy to spot
+        return batch.reshape(len(batch), -1).mean(axis=1, keepdims=True)
+
+
+def test_batch_buckets_are_powers_of_two_up_to_max_batch():
+    assert batch_buckets(1) == [1]
+    assert batch_buckets(8) == [1, 2, 4, 8]
+    assert batch_buckets(6) == [1, 2, 4, 6]
+
+
+def test_each_bucket_gets_its_own_session():
+    sessions = []
+
+    def factory():
+        sessions.append(FakeSession())
+        return sessions[-1]
+
+    session = FakeSession()
+    batcher = MicroBatcher(session, Metrics(8), max_batch=8, session_factory=factory)
+    assert batcher.sessions[1] is session
+    assert sorted(s.batch_size for s in sessions) == [2, 4, 8]
+
+    predictions, _ = batcher._invoke([np.full((2, 2, 3), float(i)) for i in range(3)])
+    assert batcher.sessions[4].calls == [4]
+    np.testing.assert_allclose(predictions[:, 0], [0.0, 1.0, 2.0])
+
+
+def test_concurrent_requests_share_one_invoke():
+    session = FakeSession()
+    batcher = MicroBatcher(session, Metrics(8), max_batch=8, max_wait_ms=50.0)
+
+    async def run():
+        batcher.start()
+        try:
+            return await asyncio.gather(*[batcher.predict(np.full((2, 2, 3), float(i)))
+                                          for i in range(5)])
+        finally:
+            await batcher.stop()
+
+    results = asyncio.run(run())
+    assert [float(prediction[0]) for prediction, _ in results] == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert all(batch_size == 5 for _, batch_size in results)
+    assert session.calls == [8]
+    assert batcher.metrics.batches == 1
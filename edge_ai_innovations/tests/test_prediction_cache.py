@@ -0,0 +1,137 @@
+import sqlite3
+import threading
+
+import numpy as np
+import pytest
+
+from prediction_cache import PredictionCache
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    path = tmp_path / 'model.tflite'
+    path.write_bytes(b'model weights')
+    return str(path)
+
+
+def test_memory_hits_and_misses_are_counted(model_path):
+    cache = PredictionCache(model_path)
+    assert cache.get('a') is None
+    cache.put('a', [0.25, 0.75])
+
+    np.testing.assert_allclose(cache.get('a'), [0.25, 0.75])
+    stats = cache.stats()
+    assert stats['hits_memory'] == 1
+    assert stats['misses'] == 1
+    assert stats['hit_rate'] == 0.5
+    assert stats['disk_entries'] == 0
+
+
+def test_memory_evicts_least_recently_used(model_path):
+    cache = PredictionCache(model_path, max_memory_entries=2)
+    cache.put('a', [1.0])
+    cache.put('b', [2.0])
+    cache.get('a')
+    cache.put('c', [3.0])
+
+    assert list(cache.memory) == ['a', 'c']
+    assert cache.get('b') is None
+
+
+def test_keys_depend_on_the_model(tmp_path, model_path):
+    other_model = tmp_path / 'other.tflite'
+    other_model.write_bytes(b'other weights')
+    array = np.zeros((1, 4), dtype=np.float32)
+
+    cache = PredictionCache(model_path)
+    assert cache.key_for_bytes(b'image') == PredictionCache(model_path).key_for_bytes(b'image')
+    assert cache.key_for_bytes(b'image') != PredictionCache(str(other_model)).key_for_bytes(b'image')
+    assert cache.key_for_array(array) != cache.key_for_array(array.reshape(4, 1))
+
+
+def test_puts_are_buffered_until_commit_every(tmp_path, model_path):
+    db_path = str(tmp_path / 'cache.db')
+    cache = PredictionCache(model_path, db_path=db_path, commit_every=3)
+    cache.put('a', [1.0])
+    cache.put('b', [2.0])
+    assert cache.stats()['disk_entries'] == 0
+    # Pending puts are still served before they reach the database
+    cache.memory.clear()
+    np.testing.assert_allclose(cache.get('a'), [1.0])
+
+    cache.put('c', [3.0])
+    assert cache.stats()['disk_entries'] == 3
+    assert not cache.pending_puts
+    cache.close()
+
+
+def test_disk_entries_persist_and_count_only_new_rows(tmp_path, model_path):
+    db_path = str(tmp_path / 'cache.db')
+    cache = PredictionCache(model_path, db_path=db_path, commit_every=1)
+    cache.put('a', [1.0])
+    cache.put('a', [2.0])
+    cache.put('b', [3.0])
+    assert cache.stats()['disk_entries'] == 2
+    cache.close()
+
+    reopened = PredictionCache(model_path, db_path=db_path, max_memory_entries=0)
+    np.testing.assert_allclose(reopened.get('a'), [2.0])
+    assert reopened.stats()['hits_disk'] == 1
+    assert reopened.stats()['disk_entries'] == 2
+    reopened.close()
+
+
+def test_disk_evicts_oldest_entries_below_the_limit(tmp_path, model_path):
+    db_path = str(tmp_path / 'cache.db')
+    cache = PredictionCache(model_path, db_path=db_path, max_memory_entries=0,
+                            max_disk_entries=10, commit_every=1)
+    for i in range(11):
+        cache.put(f'key{i}', [float(i)])
+
+    assert cache.stats()['disk_entries'] == 9
+    assert cache.get('key0') is None
+    assert cache.get('key1') is None
+    np.testing.assert_allclose(cache.get('key10'), [10.0])
+    cache.close()
+
+
+def test_disk_hit_does_not_hold_a_write_lock(tmp_path, model_path):
+    db_path = str(tmp_path / 'cache.db')
+    cache = PredictionCache(model_path, db_path=db_path, max_memory_entries=0, commit_every=1)
+    cache.put('a', [1.0])
+    np.testing.assert_allclose(cache.get('a'), [1.0])
+
+    other = sqlite3.connect(db_path, timeout=0)
+    other.execute('BEGIN IMMEDIATE')
+    # Reads keep working while another process is writing
+    np.testing.assert_allclose(cache.get('a'), [1.0])
+    other.rollback()
+    other.close()
+    cache.close()
+
+
+def test_concurrent_lookups_are_all_counted(tmp_path, model_path):
+    db_path = str(tmp_path / 'cache.db')
+    cache = PredictionCache(model_path, max_memory_entries=64, db_path=db_path,
+                            commit_every=10)
+    num_threads, lookups = 8, 200
+
+    def worker(index):
+        for i in range(lookups):
+            key = f'key{(index * lookups + i) % 100}'
+            if cache.get(key) is None:
+                cache.put(key, [float(i)])
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = cache.stats()
+    assert stats['hits_memory'] + stats['hits_disk'] + stats['misses'] == num_threads * lookups
+    assert stats['memory_entries'] <= 64
+    cache.close()
+
+    reopened = PredictionCache(model_path, db_path=db_path)
+    assert reopened.stats()['disk_entries'] == 100
+    reopened.close()
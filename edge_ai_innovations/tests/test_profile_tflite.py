@@ -0,0 +1,47 @@
+from profile_tflite import parse_op_profile_csv
+
+PROFILE_CSV = """\
+Operator-wise Profiling Info for Regular Benchmark Runs:
+Run Order
+node type,first,avg_ms,%,cdf%,mem KB,times called,name
+CONV_2D,0.512,0.498,61.2%,61.2%,0,1,[sequential/conv2d/Relu]
+MAX_POOL_2D,0.101,0.097,11.9%,73.1%,0,1,[sequential/max_pooling2d/MaxPool]
+FULLY_CONNECTED,0.220,0.219,26.9%,100.0%,0,1,[sequential/dense/MatMul]
+
+Top by Computation Time
+node type,first,avg_ms,%,cdf%,mem KB,times called,name
+CONV_2D,0.512,0.498,61.2%,61.2%,0,1,[sequential/conv2d/Relu]
+"""
+
+
+def test_reads_only_the_run_order_table():
+    ops = parse_op_profile_csv(PROFILE_CSV.splitlines())
+    assert [op['op'] for op in ops] == ['CONV_2D', 'MAX_POOL_2D', 'FULLY_CONNECTED']
+    assert ops[0]['name'] == '[sequential/conv2d/Relu]'
+    assert ops[2]['avg_ms'] == 0.219
+
+
+def test_accepts_bracketed_column_names():
+    lines = [
+        'Run Order',
+        '[node type],[first],[avg ms],[%],[cdf%],[mem KB],[times called],[Name]',
+        'SOFTMAX,0.010,0.008,100.0%,100.0%,0,1,[sequential/dense/Softmax]',
+        'Summary by node type',
+    ]
+    assert parse_op_profile_csv(lines) == [
+        {'op': 'SOFTMAX', 'name': '[sequential/dense/Softmax]', 'avg_ms': 0.008}
+    ]
+
+
+def test_stops_at_a_malformed_row():
+    lines = [
+        'node type,avg_ms,name',
+        'ADD,0.5,add',
+        'MUL,n/a,mul',
+        'SUB,0.1,sub',
+    ]
+    assert [op['op'] for op in parse_op_profile_csv(lines)] == ['ADD']
+
+
+def test_no_table_gives_no_ops():
+    assert parse_op_profile_csv(['INFO: benchmark finished', '']) == []
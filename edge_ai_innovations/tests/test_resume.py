@@ -0,0 +1,81 @@
+import csv
+import json
+import os
+
+from infer_tflite import ResultWriter, load_scored, scan_images
+
+
+def test_scan_images_walks_subdirectories_in_order(tmp_path):
+    for name in ['b.jpg', 'a.PNG', 'notes.txt', 'skipped.bmp',
+                 'sub/c.jpeg', 'sub/deeper/d.jpg', 'z/e.jpg']:
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b'')
+
+    def scanned(**kwargs):
+        return [os.path.relpath(path, tmp_path).replace(os.sep, '/')
+                for path in scan_images(str(tmp_path), **kwargs)]
+
+    assert scanned() == ['a.PNG', 'b.jpg', 'sub/c.jpeg', 'sub/deeper/d.jpg', 'z/e.jpg']
+    assert scanned(recursive=False) == ['a.PNG', 'b.jpg']
+
+
+def test_csv_resume_repairs_a_truncated_line(tmp_path):
+    output_path = str(tmp_path / 'results.csv')
+    with ResultWriter(output_path) as writer:
+        writer.write({'image': 'a.jpg', 'class': 'plastic', 'confidence': 0.9, 'error': ''})
+    with open(output_path, 'a') as f:
+        f.write('b.jpg,pap')
+
+    assert load_scored(output_path) == {'a.jpg', 'b.jpg'}
+    with ResultWriter(output_path) as writer:
+        writer.write({'image': 'c.jpg', 'class': 'glass', 'confidence': 0.8, 'error': ''})
+
+    with open(output_path, newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert [row['image'] for row in rows] == ['a.jpg', 'b.jpg', 'c.jpg']
+    assert rows[2]['class'] == 'glass'
+
+
+def test_csv_resume_keeps_the_existing_header(tmp_path):
+    output_path = tmp_path / 'results.csv'
+    output_path.write_text('image,class,confidence\na.jpg,metal,0.5\n')
+
+    with ResultWriter(str(output_path)) as writer:
+        writer.write({'image': 'b.jpg', 'class': 'glass', 'confidence': 0.7, 'error': ''})
+
+    assert output_path.read_text().splitlines() == [
+        'image,class,confidence', 'a.jpg,metal,0.5', 'b.jpg,glass,0.7'
+    ]
+
+
+def test_jsonl_resume_skips_a_truncated_line(tmp_path):
+    output_path = str(tmp_path / 'results.jsonl')
+    with ResultWriter(output_path) as writer:
+        writer.write({'image': 'a.jpg', 'class': 'plastic', 'confidence': 0.9})
+    with open(output_path, 'a') as f:
+        f.write('{"image": "b.jp')
+
+    assert load_scored(output_path) == {'a.jpg'}
+    with ResultWriter(output_path) as writer:
+        writer.write({'image': 'b.jpg', 'class': 'paper', 'confidence': 0.6})
+
+    with open(output_path) as f:
+        lines = f.read().splitlines()
+    assert json.loads(lines[-1])['image'] == 'b.jpg'
+    assert load_scored(output_path) == {'a.jpg', 'b.jpg'}
+
+
+def test_error_rows_are_retried(tmp_path):
+    for name in ['results.csv', 'results.jsonl']:
+        output_path = str(tmp_path / name)
+        with ResultWriter(output_path) as writer:
+            writer.write({'image': 'a.jpg', 'class': 'plastic', 'confidence': 0.9, 'error': ''})
+            writer.write({'image': 'b.jpg', 'class': None, 'confidence': None,
+                          'error': 'cannot identify image file'})
+
+        assert load_scored(output_path) == {'a.jpg'}
+
+
+def test_missing_output_has_nothing_scored(tmp_path):
+    assert load_scored(str(tmp_path / 'missing.csv')) == set()
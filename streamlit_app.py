@@ -2,7 +2,25 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from pathlib import Path
+from PIL import Image
+import io
 import json
+import sys
+import threading
+import time
+import zipfile
+
+BASE_DIR = Path(__file__).resolve().parent / "edge_ai_innovations"
+MODELS_DIR = BASE_DIR / "models"
+LABELS_PATH = MODELS_DIR / "class_names.txt"
+sys.path.insert(0, str(BASE_DIR / "scripts"))
+
+MODEL_VARIANTS = {
+    "Float32": "recyclable_classifier_float32.tflite",
+    "Float16": "recyclable_classifier.tflite",
+    "Int8": "recyclable_classifier_quant.tflite",
+}
 
 st.set_page_config(
     page_title="Edge AI Innovations - Analysis Studio",
@@ -29,6 +47,124 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource
+def load_session(model_path):
+    from infer_tflite import ClassifierSession
+
+    session = ClassifierSession(model_path, str(LABELS_PATH))
+    # Warm up so the first measured request does not include lazy init
+    session.predict(np.zeros(session.input_shape[1:], dtype=np.float32))
+    # One interpreter is shared by every browser session on this server
+    return session, threading.Lock()
+
+@st.cache_data
+def _read_json(path, mtime):
+    # mtime is part of the cache key so a rewritten file is parsed again
+    with open(path) as f:
+        return json.load(f)
+
+def load_results(pattern):
+    results = {}
+    for path in sorted(MODELS_DIR.glob(pattern)):
+        try:
+            results[str(path)] = _read_json(str(path), path.stat().st_mtime)
+        except (OSError, ValueError):
+            st.warning(f"Could not read `{path.name}`")
+    return results
+
+IMAGE_TYPES = ["jpg", "jpeg", "png"]
+
+def _is_image_entry(name):
+    return Path(name).suffix.lower().lstrip(".") in IMAGE_TYPES and "__MACOSX" not in name
+
+def count_uploaded_images(uploaded_files):
+    total = 0
+    for uploaded in uploaded_files:
+        if uploaded.name.lower().endswith(".zip"):
+            with zipfile.ZipFile(uploaded) as archive:
+                total += sum(1 for name in archive.namelist() if _is_image_entry(name))
+            uploaded.seek(0)
+        else:
+            total += 1
+    return total
+
+def iter_uploaded_images(uploaded_files):
+    """Yields (name, file object) for each uploaded image, expanding zip archives in memory."""
+    for uploaded in uploaded_files:
+        if not uploaded.name.lower().endswith(".zip"):
+            yield uploaded.name, uploaded
+            continue
+        with zipfile.ZipFile(uploaded) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and _is_image_entry(info.filename):
+                    yield info.filename, io.BytesIO(archive.read(info))
+
+def label_from_name(name, labels):
+    """Ground truth from a class folder in the path or a class-name prefix on the file."""
+    parts = [part.lower() for part in Path(name).parts]
+    for part in reversed(parts[:-1]):
+        if part in labels:
+            return labels[part]
+    stem = parts[-1]
+    for label in sorted(labels, key=len, reverse=True):
+        if stem.startswith(label):
+            return labels[label]
+    return None
+
+def score_uploads(session, session_lock, images, batch_size):
+    """Scores (name, file) pairs through one shared session, yielding the rows of each batch."""
+    from infer_tflite import preprocess_into
+
+    height, width = int(session.input_shape[1]), int(session.input_shape[2])
+    batch = np.empty((batch_size, height, width, 3), dtype=np.float32)
+    labels = {label.lower(): label for label in session.labels}
+    pending = []
+
+    def run():
+        count = sum(1 for row in pending if "decode_ms" in row)
+        if count:
+            with session_lock:
+                start = time.perf_counter()
+                predictions = session.predict_batch(batch[:count])
+                latency_ms = (time.perf_counter() - start) * 1000 / count
+        slot = 0
+        rows = []
+        for row in pending:
+            if "decode_ms" not in row:
+                rows.append({"Image": row["name"], "Actual": row["actual"], "Predicted": None,
+                             "Confidence (%)": None, "Decode (ms)": None, "Inference (ms)": None})
+                continue
+            label, confidence = session.classify(predictions[slot])
+            slot += 1
+            rows.append({
+                "Image": row["name"],
+                "Actual": row["actual"],
+                "Predicted": label,
+                "Confidence (%)": round(confidence, 2),
+                "Decode (ms)": round(row["decode_ms"], 2),
+                "Inference (ms)": round(latency_ms, 2),
+            })
+        pending.clear()
+        return rows
+
+    filled = 0
+    for name, file in images:
+        row = {"name": name, "actual": label_from_name(name, labels)}
+        start = time.perf_counter()
+        try:
+            preprocess_into(Image.open(file), batch[filled])
+        except OSError:
+            pending.append(row)
+            continue
+        row["decode_ms"] = (time.perf_counter() - start) * 1000
+        pending.append(row)
+        filled += 1
+        if filled == batch_size:
+            yield run()
+            filled = 0
+    if pending:
+        yield run()
+
 st.title("🤖 Edge AI Innovations - Analysis Studio")
 st.markdown("**Analyze recyclable items, simulate smart agriculture, and explore edge AI capabilities**")
 
@@ -50,15 +186,26 @@ if analysis_type == "📊 Recyclable Classification":
     with col1:
         st.subheader("Model Configuration")
 
-        model_size = st.slider("Model Size (MB)", 0.5, 5.0, 1.8, 0.1)
-        quantization = st.selectbox("Quantization Type", ["Float32", "Float16", "Int8"])
+        quantization = st.selectbox("Quantization Type", list(MODEL_VARIANTS), index=1)
         device = st.selectbox("Target Device", ["Raspberry Pi 4", "Raspberry Pi Zero", "Mobile", "Desktop"])
 
-        col_a, col_b = st.columns(2)
-        with col_a:
-            image_resolution = st.slider("Image Resolution", 128, 512, 224, 64)
-        with col_b:
-            batch_size = st.slider("Batch Size", 1, 32, 1)
+        model_path = MODELS_DIR / MODEL_VARIANTS[quantization]
+        session = None
+        if model_path.exists() and LABELS_PATH.exists():
+            try:
+                session, session_lock = load_session(str(model_path))
+            except ImportError:
+                st.error("Install `tflite-runtime` (or `tensorflow`) to run the model.")
+        else:
+            st.warning(
+                f"`{model_path.relative_to(BASE_DIR)}` not found. Train and convert the model first:\n\n"
+                "`python scripts/train.py` then `python scripts/convert_tflite.py`"
+            )
+
+        if session is not None:
+            model_size = model_path.stat().st_size / (1024 * 1024)
+            st.write(f"**Model file**: `{model_path.name}` ({model_size:.2f} MB)")
+            st.write(f"**Input**: {list(session.input_shape)} {np.dtype(session.input_dtype).name}")
 
     with col2:
         st.subheader("Performance Metrics")
@@ -75,58 +222,94 @@ if analysis_type == "📊 Recyclable Classification":
 
     st.markdown("---")
 
-    col_perf1, col_perf2, col_perf3, col_perf4 = st.columns(4)
-
-    with col_perf1:
-        device_factors = {
-            "Raspberry Pi 4": 35,
-            "Raspberry Pi Zero": 180,
-            "Mobile": 25,
-            "Desktop": 8,
-        }
-        inference_time = device_factors[device] * (model_size / 1.8)
-        st.metric("Inference Time", f"{inference_time:.0f}ms", "per image")
-
-    with col_perf2:
-        power_factors = {
-            "Raspberry Pi 4": 3.5,
-            "Raspberry Pi Zero": 1.2,
-            "Mobile": 2.0,
-            "Desktop": 65,
-        }
-        power = power_factors[device]
-        st.metric("Power Consumption", f"{power}W", "estimated")
-
-    with col_perf3:
-        throughput = (1000 / inference_time) * batch_size
-        st.metric("Throughput", f"{throughput:.1f} img/s", "at batch size")
-
-    with col_perf4:
-        reduction = (1 - model_size / 5.0) * 100
-        st.metric("Size Reduction", f"{reduction:.0f}%", "vs full model")
+    metrics_container = st.container()
 
     st.markdown("---")
     st.subheader("Classification Results")
 
-    col_upload, col_simulate = st.columns([1, 1])
-
-    with col_upload:
-        st.write("**Upload Sample Data**")
-        uploaded_file = st.file_uploader("Choose an image...", type=["jpg", "png", "jpeg"])
-        if uploaded_file:
-            st.success("✅ Image uploaded successfully!")
+    upload_mode = st.radio("Upload Mode", ["Single image", "Batch (multiple files or zip)"],
+                           horizontal=True)
 
-    with col_simulate:
-        st.write("**Simulate Classification**")
-        simulate = st.button("🎯 Run Simulation", use_container_width=True)
-
-    if simulate or uploaded_file:
-        classes = ["Plastic", "Paper", "Glass", "Metal", "Organic"]
-        confidences = np.random.dirichlet(np.ones(5)) * 100
+    latency_ms = None
+    throughput = None
+    if upload_mode == "Single image":
+        uploaded_file = st.file_uploader("Choose an image...", type=IMAGE_TYPES)
+    else:
+        uploaded_file = None
+        uploaded_files = st.file_uploader("Choose images or zip archives...",
+                                          type=IMAGE_TYPES + ["zip"], accept_multiple_files=True)
+        batch_size = st.select_slider("Batch Size", options=[1, 4, 8, 16, 32], value=8)
+        st.caption("Ground truth is read from a class folder inside the zip "
+                   "(e.g. `plastic/img_01.jpg`) or a class-name prefix on the file name.")
+
+        if uploaded_files and session is not None and st.button("Score uploads"):
+            total = count_uploaded_images(uploaded_files)
+            progress = st.progress(0.0, text=f"Scoring 0 / {total} images")
+            table = st.empty()
+            rows = []
+            started = time.perf_counter()
+
+            for batch_rows in score_uploads(session, session_lock,
+                                            iter_uploaded_images(uploaded_files), batch_size):
+                rows.extend(batch_rows)
+                progress.progress(min(len(rows) / max(total, 1), 1.0),
+                                  text=f"Scoring {len(rows)} / {total} images")
+                table.dataframe(pd.DataFrame(rows), use_container_width=True)
+
+            wall = time.perf_counter() - started
+            results_df = pd.DataFrame(rows)
+            scored = results_df.dropna(subset=["Predicted"]) if rows else results_df
+            unreadable = len(results_df) - len(scored)
+            progress.progress(1.0, text=f"Scored {len(scored)} images in {wall:.1f}s"
+                              + (f" ({unreadable} unreadable)" if unreadable else ""))
+
+            if len(scored):
+                latency_ms = scored["Inference (ms)"].mean()
+                throughput = len(scored) / wall
+
+                labeled = scored.dropna(subset=["Actual"])
+                col_confusion, col_latency = st.columns(2)
+
+                with col_confusion:
+                    st.write("**Confusion Matrix** (rows: actual, columns: predicted)")
+                    if len(labeled):
+                        confusion = pd.crosstab(labeled["Actual"], labeled["Predicted"]).reindex(
+                            index=session.labels, columns=session.labels, fill_value=0)
+                        st.dataframe(confusion, use_container_width=True)
+                        accuracy = (labeled["Actual"] == labeled["Predicted"]).mean() * 100
+                        st.metric("Accuracy", f"{accuracy:.1f}%", f"{len(labeled)} labeled images")
+                    else:
+                        st.info("No ground truth found in the uploaded file names.")
+
+                with col_latency:
+                    st.write("**Latency by Predicted Class** (inference amortized per batch)")
+                    latency_summary = scored.groupby("Predicted").agg(
+                        Images=("Image", "count"),
+                        **{
+                            "Decode p50 (ms)": ("Decode (ms)", "median"),
+                            "Decode p95 (ms)": ("Decode (ms)", lambda x: x.quantile(0.95)),
+                            "Inference p50 (ms)": ("Inference (ms)", "median"),
+                            "Inference p95 (ms)": ("Inference (ms)", lambda x: x.quantile(0.95)),
+                        }
+                    ).round(2)
+                    st.dataframe(latency_summary, use_container_width=True)
+
+                st.download_button("Download results (CSV)", results_df.to_csv(index=False),
+                                   file_name="batch_predictions.csv", mime="text/csv")
+
+    if uploaded_file and session is not None:
+        image = Image.open(uploaded_file)
+        st.image(image, caption=uploaded_file.name, width=300)
+
+        with session_lock:
+            start = time.perf_counter()
+            predictions = session.predict_frame(image)
+            latency_ms = (time.perf_counter() - start) * 1000
+        throughput = 1000 / latency_ms
 
         results_df = pd.DataFrame({
-            "Class": classes,
-            "Confidence (%)": confidences.round(2)
+            "Class": [label.title() for label in session.labels],
+            "Confidence (%)": (predictions * 100).round(2)
         }).sort_values("Confidence (%)", ascending=False)
 
         st.dataframe(results_df, use_container_width=True)
@@ -143,6 +326,40 @@ if analysis_type == "📊 Recyclable Classification":
                 st.success(f"**Predicted Class**: {top_class['Class']}")
                 st.info(f"**Confidence**: {top_class['Confidence (%)']:.2f}%")
 
+    with metrics_container:
+        col_perf1, col_perf2, col_perf3, col_perf4 = st.columns(4)
+
+        with col_perf1:
+            if latency_ms is not None:
+                st.metric("Inference Time", f"{latency_ms:.1f}ms", "measured on this server")
+            else:
+                st.metric("Inference Time", "—", "upload an image to measure")
+
+        with col_perf2:
+            power_factors = {
+                "Raspberry Pi 4": 3.5,
+                "Raspberry Pi Zero": 1.2,
+                "Mobile": 2.0,
+                "Desktop": 65,
+            }
+            power = power_factors[device]
+            st.metric("Power Consumption", f"{power}W", "estimated")
+
+        with col_perf3:
+            if throughput:
+                st.metric("Throughput", f"{throughput:.1f} img/s",
+                          "single image" if uploaded_file else "end-to-end batch")
+            else:
+                st.metric("Throughput", "—")
+
+        with col_perf4:
+            keras_path = MODELS_DIR / "recyclable_classifier.h5"
+            if session is not None and keras_path.exists():
+                reduction = (1 - model_path.stat().st_size / keras_path.stat().st_size) * 100
+                st.metric("Size Reduction", f"{reduction:.0f}%", "vs Keras model")
+            else:
+                st.metric("Size Reduction", "—")
+
 elif analysis_type == "🌾 Smart Agriculture":
     st.header("AI-IoT Smart Agriculture Simulation")
 
@@ -364,53 +581,150 @@ elif analysis_type == "📈 Model Performance":
         "Deployment Cost Analysis"
     ])
 
-    if metric_type == "Inference Performance":
-        st.subheader("Inference Speed Across Devices")
+    benchmarks = load_results("benchmark_results*.json")
+    telemetry = load_results("*_telemetry.json")
 
-        devices = ["Raspberry Pi 4", "Raspberry Pi Zero", "Mobile Phone", "Desktop", "GPU Server"]
-        inference_times = [35, 180, 25, 8, 2]
-        throughputs = [28, 5, 40, 125, 500]
+    benchmark_hint = (
+        "No benchmark results found in `edge_ai_innovations/models/`. Run "
+        "`python scripts/benchmark_tflite.py --output ./models/benchmark_results_<machine>.json` "
+        "on each device, then copy the files here."
+    )
+    telemetry_hint = (
+        "No training telemetry found in `edge_ai_innovations/models/`. "
+        "`python scripts/train.py` writes `*_telemetry.json` after every epoch."
+    )
 
-        col1, col2 = st.columns(2)
+    if metric_type in ("Inference Performance", "Resource Utilization") and benchmarks:
+        reports = {
+            f"{report['machine'].get('hostname') or report['machine']['processor']} "
+            f"({report['timestamp']})": report
+            for report in benchmarks.values()
+        }
+        selected_machines = st.multiselect("Machines", list(reports), default=list(reports))
 
-        with col1:
-            perf_df = pd.DataFrame({
-                "Device": devices,
-                "Inference Time (ms)": inference_times,
-                "Throughput (img/s)": throughputs
-            })
-            st.dataframe(perf_df, use_container_width=True)
+    if metric_type == "Inference Performance":
+        st.subheader("Inference Speed Across Devices")
 
-        with col2:
-            st.bar_chart(perf_df.set_index("Device")["Inference Time (ms)"])
+        if not benchmarks:
+            st.info(benchmark_hint)
+        else:
+            rows = []
+            for machine in selected_machines:
+                for variant in reports[machine]["variants"]:
+                    for config in variant["configs"]:
+                        if not config.get("supported", True):
+                            continue
+                        rows.append({
+                            "Machine": machine,
+                            "Model": Path(variant["model"]).name,
+                            "Threads": config["num_threads"],
+                            "Batch": config["batch_size"],
+                            "p50 (ms)": round(config["p50_ms"], 2),
+                            "p95 (ms)": round(config["p95_ms"], 2),
+                            "p99 (ms)": round(config["p99_ms"], 2),
+                            "Throughput (img/s)": round(config["images_per_sec"], 1),
+                            "latencies": config.get("latencies_ms"),
+                        })
+
+            if rows:
+                perf_df = pd.DataFrame(rows)
+                st.dataframe(perf_df.drop(columns="latencies"), use_container_width=True)
+
+                col1, col2 = st.columns(2)
+
+                with col1:
+                    st.write("**Best throughput per model and machine (img/s)**")
+                    best = perf_df.groupby(["Machine", "Model"])["Throughput (img/s)"].max()
+                    st.bar_chart(best.unstack("Model"))
+
+                with col2:
+                    st.write("**Latency distribution**")
+                    labels = [
+                        f"{row.Machine} · {row.Model} · {row.Threads}t × b{row.Batch}"
+                        for row in perf_df.itertuples()
+                    ]
+                    choice = st.selectbox("Configuration", range(len(labels)),
+                                          format_func=labels.__getitem__)
+                    latencies = perf_df.iloc[choice]["latencies"]
+                    if latencies:
+                        counts, edges = np.histogram(latencies, bins=20)
+                        hist_df = pd.DataFrame({
+                            "Latency (ms)": [f"{edge:.2f}" for edge in edges[:-1]],
+                            "Invokes": counts,
+                        })
+                        st.bar_chart(hist_df.set_index("Latency (ms)"))
+                    else:
+                        st.caption("This report predates raw latency samples; re-run the benchmark.")
 
     elif metric_type == "Model Accuracy":
-        st.subheader("Accuracy Metrics by Class")
-
-        accuracy_data = pd.DataFrame({
-            "Class": ["Plastic", "Paper", "Glass", "Metal", "Organic"],
-            "Accuracy": [94.2, 88.5, 91.3, 89.7, 85.2],
-            "Precision": [93.1, 87.2, 90.1, 88.5, 84.0],
-            "Recall": [95.5, 89.8, 92.5, 90.9, 86.4]
-        })
-
-        st.dataframe(accuracy_data, use_container_width=True)
-        st.line_chart(accuracy_data.set_index("Class"))
+        st.subheader("Accuracy Metrics")
+
+        if benchmarks:
+            rows = [
+                {
+                    "Report": Path(path).name,
+                    "Model": Path(variant["model"]).name,
+                    "Size (KB)": round(variant["model_size_kb"], 1),
+                    "Input": variant["input_dtype"],
+                    "Top-1 agreement with Keras (%)": (
+                        round(variant["top1_agreement"] * 100, 1)
+                        if "top1_agreement" in variant else None
+                    ),
+                }
+                for path, report in benchmarks.items()
+                for variant in report["variants"]
+            ]
+            st.write("**Quantized variants vs. the Keras model**")
+            st.dataframe(pd.DataFrame(rows), use_container_width=True)
+        else:
+            st.info(benchmark_hint)
+
+        if telemetry:
+            run = st.selectbox("Training run", list(telemetry), format_func=lambda path: Path(path).name)
+            epochs_df = pd.DataFrame(telemetry[run]["epochs"]).set_index("epoch")
+            accuracy_columns = [column for column in epochs_df.columns if "accuracy" in column]
+            if accuracy_columns:
+                st.write("**Accuracy by epoch**")
+                st.line_chart(epochs_df[accuracy_columns])
+        else:
+            st.info(telemetry_hint)
 
     elif metric_type == "Resource Utilization":
         st.subheader("Resource Usage During Inference")
 
-        time_points = np.arange(0, 100, 5)
-        cpu_usage = 30 + 20 * np.sin(time_points / 10) + np.random.normal(0, 2, len(time_points))
-        memory_usage = 40 + 10 * np.cos(time_points / 15) + np.random.normal(0, 1, len(time_points))
-
-        resource_df = pd.DataFrame({
-            "Time (s)": time_points,
-            "CPU Usage (%)": cpu_usage,
-            "Memory Usage (%)": memory_usage
-        })
-
-        st.line_chart(resource_df.set_index("Time (s)"))
+        if not benchmarks:
+            st.info(benchmark_hint)
+        else:
+            for machine in selected_machines:
+                for variant in reports[machine]["variants"]:
+                    trace = variant.get("resource_trace")
+                    if not trace:
+                        continue
+                    st.write(f"**{machine} · {Path(variant['model']).name}** "
+                             f"(peak RSS {variant['peak_rss_mb']:.1f} MB)")
+                    resource_df = pd.DataFrame(trace).set_index("t_sec")
+                    col_cpu, col_rss = st.columns(2)
+                    with col_cpu:
+                        st.line_chart(resource_df["cpu_percent"].rename("CPU (%)"))
+                    with col_rss:
+                        st.line_chart(resource_df["rss_mb"].rename("RSS (MB)"))
+
+        st.subheader("Resource Usage During Training")
+
+        if not telemetry:
+            st.info(telemetry_hint)
+        else:
+            for path, run in telemetry.items():
+                epochs_df = pd.DataFrame(run["epochs"]).set_index("epoch")
+                st.write(f"**{Path(path).name}** (batch size {run['batch_size']}, "
+                         f"{run['cpu_count']} CPUs)")
+                col_cpu, col_rss = st.columns(2)
+                with col_cpu:
+                    st.line_chart(epochs_df[["cpu_percent", "images_per_sec"]])
+                with col_rss:
+                    st.line_chart(epochs_df[["peak_rss_mb"]])
+                st.caption(f"Input pipeline wait: "
+                           f"{epochs_df['input_wait_fraction'].mean() * 100:.1f}% of epoch time")
 
     else:
         st.subheader("Deployment Cost Analysis")